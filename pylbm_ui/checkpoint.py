@@ -0,0 +1,167 @@
+# Authors:
+#     Loic Gouarin <loic.gouarin@polytechnique.edu>
+#     Benjamin Graille <benjamin.graille@universite-paris-saclay.fr>
+#     Thibaut Van Hoof <thibaut.vanhoof@cenaero.be>
+#
+# License: BSD 3 clause
+
+import os
+import json
+import time
+
+import h5py
+import numpy as np
+
+from schema.utils import canonical_hash
+
+checkpoint_filename = 'checkpoint.h5'
+
+
+def checkpoint_key(test_case, lb_scheme, dx, extra_config=None, codegen=None):
+    """
+    Return the hash of the configuration of a simulation.
+
+    A checkpoint can only be restored in a simulation with the same key.
+    The generator is part of the key since the distribution functions
+    are not stored in the same order by all the generators.
+    """
+    return canonical_hash({
+        'test_case': {
+            'class': f'{test_case.__module__}.{test_case.__class__.__name__}',
+            'args': json.loads(test_case.json()),
+        },
+        'lb_scheme': {
+            'class': f'{lb_scheme.__module__}.{lb_scheme.__class__.__name__}',
+            'args': json.loads(lb_scheme.json()),
+        },
+        'dx': dx,
+        'codegen': codegen,
+        'extra_config': {str(k): v for k, v in (extra_config or {}).items()},
+    })
+
+
+class Checkpoint:
+    """
+    Save and restore the state of a pylbm simulation.
+
+    The distribution functions with the halo points, the time, the
+    number of iterations and the key of the configuration are written
+    in a hdf5 file. The file is first written next to the previous
+    checkpoint and then replaces it so that a checkpoint is never
+    corrupted by a crash.
+
+    Parameters
+    ==========
+
+    - filename: str
+        the hdf5 file of the checkpoint.
+
+    - key: str
+        the key of the configuration given by checkpoint_key.
+
+    - period: float
+        the minimum time in seconds between two checkpoints written by
+        a call (default is 600).
+
+    """
+    def __init__(self, filename, key, period=600):
+        self.filename = filename
+        self.key = key
+        self.period = period
+        self.last_save = time.time()
+
+    def exists(self):
+        return os.path.exists(self.filename)
+
+    def read_key(self):
+        """Return the key of the configuration stored in the checkpoint."""
+        with h5py.File(self.filename, 'r') as h5_data:
+            return h5_data.attrs['key']
+
+    def is_compatible(self):
+        """Return True if the checkpoint can be restored in this configuration."""
+        return self.exists() and self.read_key() == self.key
+
+    def __call__(self, sol):
+        """Save sol if the last checkpoint is older than the period."""
+        if time.time() - self.last_save >= self.period:
+            self.save(sol)
+
+    def save(self, sol):
+        """Write the checkpoint of sol."""
+        path = os.path.dirname(self.filename)
+        if path and not os.path.exists(path):
+            os.makedirs(path)
+
+        if sol._need_init:
+            sol._initialize()
+
+        tmpfilename = self.filename + '.part'
+        with h5py.File(tmpfilename, 'w') as h5_data:
+            h5_data.create_dataset('F', data=self._get(sol.container.F.array))
+            h5_data.attrs['t'] = sol.t
+            h5_data.attrs['nt'] = sol.nt
+            h5_data.attrs['key'] = self.key
+        os.replace(tmpfilename, self.filename)
+        self.last_save = time.time()
+
+    def read(self):
+        """
+        Return the state stored in the checkpoint as a dictionary
+        with the distribution functions F, t and nt.
+        """
+        with h5py.File(self.filename, 'r') as h5_data:
+            if h5_data.attrs['key'] != self.key:
+                raise ValueError(
+                    f'{self.filename} was written by another configuration'
+                )
+            return {
+                'F': h5_data['F'][...],
+                't': float(h5_data.attrs['t']),
+                'nt': int(h5_data.attrs['nt']),
+            }
+
+    def load(self, sol):
+        """
+        Restore the checkpoint in sol.
+
+        The boundary conditions of sol are initialized as usual and then
+        the distribution functions are replaced by those of the checkpoint.
+        """
+        self.restore(sol, self.read())
+
+    def restore(self, sol, state):
+        """Restore in sol a state given by read."""
+        F = state['F']
+        if sol._need_init:
+            sol._initialize()
+
+        if F.shape != sol.container.F.array.shape:
+            raise ValueError(
+                f'{self.filename}: the distribution functions have the shape {F.shape} '
+                f'instead of {sol.container.F.array.shape}'
+            )
+        self._set(sol.container.F.array, F)
+        self._set(sol.container.Fnew.array, F)
+        sol.t = state['t']
+        sol.nt = state['nt']
+        sol._update_m = True
+        self.last_save = time.time()
+
+    def remove(self):
+        if self.exists():
+            os.remove(self.filename)
+
+    @staticmethod
+    def _get(array):
+        # the arrays are on the device with the loopy backend
+        if hasattr(array, 'get'):
+            return array.get()
+        return np.asarray(array)
+
+    @staticmethod
+    def _set(array, data):
+        if hasattr(array, 'set'):
+            array.set(data)
+        else:
+            array[...] = data
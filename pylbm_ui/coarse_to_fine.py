@@ -0,0 +1,190 @@
+# Authors:
+#     Loic Gouarin <loic.gouarin@polytechnique.edu>
+#     Benjamin Graille <benjamin.graille@universite-paris-saclay.fr>
+#     Thibaut Van Hoof <thibaut.vanhoof@cenaero.be>
+#
+# License: BSD 3 clause
+
+import time
+
+import numpy as np
+from scipy import ndimage
+from scipy.interpolate import RegularGridInterpolator
+
+from .responses import ResidualMonitor
+
+
+def fluid_values(sol, data):
+    """
+    Return a copy of data where the values of the solid cells are
+    replaced by those of the nearest fluid cell.
+    """
+    vmax = sol.domain.stencil.vmax
+    ind = tuple(slice(vm, -vm) for vm in vmax)
+    solid = (sol.domain.in_or_out != sol.domain.valin)[ind]
+    data = np.array(data)
+    if solid.any() and not solid.all():
+        nearest = ndimage.distance_transform_edt(
+            solid, return_distances=False, return_indices=True
+        )
+        data = data[tuple(nearest)]
+    return data
+
+
+class MomentInterpolation:
+    """
+    Initial condition of a conserved moment interpolated from the
+    values of a simulation on another grid.
+
+    The points outside of the grid (the halo points) are extrapolated.
+
+    Parameters
+    ==========
+
+    - coords: list
+        the coordinates of the grid in each direction.
+
+    - data: numpy array
+        the values of the moment on the grid.
+
+    """
+    def __init__(self, coords, data):
+        self.interpolator = RegularGridInterpolator(
+            coords, data, bounds_error=False, fill_value=None
+        )
+
+    def __call__(self, *coords):
+        coords = np.broadcast_arrays(*coords)
+        points = np.stack([c.ravel() for c in coords], axis=-1)
+        return self.interpolator(points).reshape(coords[0].shape)
+
+
+def moments_init(sol):
+    """
+    Return the initial conditions of the conserved moments given by the
+    current state of sol, to initialize a simulation on another grid.
+    """
+    coords = [sol.domain.x]
+    if sol.dim > 1:
+        coords.append(sol.domain.y)
+    if sol.dim > 2:
+        coords.append(sol.domain.z)
+
+    return {
+        k: (MomentInterpolation(coords, fluid_values(sol, sol.m[k])), ())
+        for k in sol.scheme.consm.keys()
+    }
+
+
+def initialize_from(sol, init):
+    """
+    Replace the initial conditions of sol by init (given by moments_init).
+
+    The non conserved moments are set at equilibrium.
+    """
+    sol.init_type = 'moments'
+    sol.init_data = init
+    sol._need_init = True
+
+
+def run_coarse_to_fine(
+    simu, v_model, test_case, lb_scheme, dx_list,
+    codegen=None, codegen_dir=None, steady_tol=None, run_last=True,
+    on_level=None
+):
+    """
+    Run a simulation on a sequence of grids from the coarsest to the
+    finest one: each level is initialized with the conserved moments of
+    the previous level at equilibrium.
+
+    Each level runs until the steady state is reached if steady_tol is
+    given or until the duration of the test case. The time restarts
+    from 0 on each level.
+
+    Parameters
+    ==========
+
+    - simu: simulation
+        the simulation (see simulation.py): simu.sol is the
+        simulation of the finest level at the end.
+
+    - v_model: dict
+        the names of the model, the test case and the scheme.
+
+    - test_case:
+        the test case.
+
+    - lb_scheme:
+        the lattice Boltzmann scheme.
+
+    - dx_list: list
+        the space steps of the levels.
+
+    - codegen: str
+        the generator used by pylbm (default is None).
+
+    - codegen_dir: str
+        the directory of the generated code (default is None).
+
+    - steady_tol: float
+        the tolerance of the steady state (default is None: each
+        level runs until the duration of the test case).
+
+    - run_last: bool
+        if False, the finest level is only initialized and not run
+        (default is True).
+
+    - on_level: callable
+        called with the index of the level and its space step before
+        it is run.
+
+    Returns
+    =======
+
+    The statistics of each level.
+
+    """
+    dx_list = sorted(dx_list, reverse=True)
+    stats = []
+    init = None
+    for level, dx in enumerate(dx_list):
+        if on_level is not None:
+            on_level(level, dx)
+
+        t1 = time.time()
+        simu.reset_sol(
+            v_model, test_case, lb_scheme, dx,
+            codegen, codegen_dir, initialize=False
+        )
+        sol = simu.sol
+        if init is not None:
+            initialize_from(sol, init)
+        last = level == len(dx_list) - 1 and not run_last
+        if last:
+            # the caller saves and plots the initial state of sol
+            sol._initialize()
+        level_stats = {'dx': dx, 'initialization': time.time() - t1}
+
+        if last:
+            stats.append(level_stats)
+            break
+
+        monitor = ResidualMonitor(steady_tol) if steady_tol else None
+        stop_time = simu.duration - .5*sol.dt
+        t1 = time.time()
+        while sol.t < stop_time:
+            sol.one_time_step()
+            if monitor is not None and monitor(simu.duration, sol):
+                level_stats['steady_time'] = sol.t
+                break
+        t2 = time.time()
+
+        level_stats['LBM'] = t2 - t1
+        level_stats['nt'] = float(sol.nt)
+        level_stats['domain_size'] = float(np.prod(sol.domain.shape_in))
+        level_stats['MLUPS'] = sol.nt*np.prod(sol.domain.shape_in)/max(t2 - t1, 1e-12)/1e6
+        stats.append(level_stats)
+
+        init = moments_init(sol)
+
+    return stats
@@ -0,0 +1,144 @@
+# Authors:
+#     Loic Gouarin <loic.gouarin@polytechnique.edu>
+#     Benjamin Graille <benjamin.graille@universite-paris-saclay.fr>
+#     Thibaut Van Hoof <thibaut.vanhoof@cenaero.be>
+#
+# License: BSD 3 clause
+
+import numpy as np
+
+from .responses import Error, ErrorStd, FromConfig
+
+
+def convergence_dx(dx, ratio, n_levels):
+    """
+    Return the space steps of a convergence study from the finest dx
+    to the coarsest one dx*ratio**(n_levels - 1).
+    """
+    return [dx*ratio**k for k in range(n_levels)]
+
+
+def error_norm(response, value, dx, dim):
+    """
+    Return the error given by a response of type Error, ErrorAvg or
+    ErrorStd without log10.
+
+    The absolute errors are discrete l2 norms: they are multiplied by
+    dx**(dim/2) to approximate the L2 norm so that the errors of
+    different grids can be compared.
+    """
+    if value is None:
+        return np.nan
+    error = 10**value if response.log10 else value
+    if not getattr(response, 'relative', False):
+        error *= dx**(dim/2)
+    return error
+
+
+def observed_order(dx, errors):
+    """
+    Return the orders of convergence between two successive grids and
+    the order given by a least squares fit of log(error) = p log(dx) + c.
+
+    The errors which are not finite and positive are ignored.
+    """
+    dx = np.asarray(dx, dtype=float)
+    errors = np.asarray(errors, dtype=float)
+    valid = np.isfinite(errors) & (errors > 0)
+
+    orders = []
+    for i in range(dx.size - 1):
+        if valid[i] and valid[i + 1]:
+            orders.append(float(np.log(errors[i + 1]/errors[i])/np.log(dx[i + 1]/dx[i])))
+        else:
+            orders.append(np.nan)
+
+    order = np.nan
+    if np.count_nonzero(valid) > 1:
+        order = float(np.polyfit(np.log(dx[valid]), np.log(errors[valid]), 1)[0])
+    return orders, order
+
+
+def richardson_extrapolation(dx, values):
+    """
+    Return the observed order and the Richardson extrapolation of a
+    quantity computed on the three finest grids of a convergence study.
+
+    With f1, f2 and f3 the values from the finest to the coarsest grid
+    and r the refinement ratio, the order is
+
+        p = log((f3 - f2)/(f2 - f1))/log(r)
+
+    and the extrapolated value is f1 + (f1 - f2)/(r**p - 1).
+
+    nan is returned when the values don't converge monotonically.
+    """
+    if len(values) < 3:
+        return np.nan, np.nan
+    f1, f2, f3 = (float(f) if f is not None else np.nan for f in values[:3])
+    ratio = dx[1]/dx[0]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        q = (f3 - f2)/(f2 - f1)
+        if not np.isfinite(q) or q <= 0:
+            return np.nan, np.nan
+        order = np.log(q)/np.log(ratio)
+        if order == 0:
+            return np.nan, np.nan
+        return float(order), float(f1 + (f1 - f2)/(ratio**order - 1))
+
+
+def convergence_report(dx, dim, names, responses, outputs):
+    """
+    Return the observed orders of convergence of the responses of a
+    convergence study.
+
+    Parameters
+    ==========
+
+    - dx: list
+        the space steps from the finest to the coarsest one.
+
+    - dim: int
+        the dimension of the problem.
+
+    - names: list
+        the names of the responses.
+
+    - responses: list
+        the responses of one of the simulations.
+
+    - outputs: list
+        the outputs of the simulations (see run_simulation in
+        widgets/parametric_study.py): the stability followed by the
+        values of the responses.
+
+    Returns
+    =======
+
+    A dictionary with an entry by response: the errors are analyzed
+    with observed_order and the other quantities with
+    richardson_extrapolation.
+
+    """
+    report = {'dx': list(dx)}
+    stable = [bool(o[0]) for o in outputs]
+    for i, (name, response) in enumerate(zip(names, responses)):
+        if response is None or isinstance(response, FromConfig):
+            continue
+        values = [o[i + 1] if s else None for o, s in zip(outputs, stable)]
+        if isinstance(values[0], str) or (values[0] is not None and not np.isscalar(values[0])):
+            continue
+
+        if isinstance(response, (Error, ErrorStd)):
+            errors = [error_norm(response, val, h, dim) for val, h in zip(values, dx)]
+            orders, order = observed_order(dx, errors)
+            report[name] = {'errors': errors, 'orders': orders, 'order': order}
+        else:
+            order, extrapolation = richardson_extrapolation(dx, values)
+            report[name] = {
+                'values': [np.nan if val is None else float(val) for val in values],
+                'order': order,
+                'extrapolation': extrapolation,
+            }
+    return report
@@ -0,0 +1,534 @@
+# Authors:
+#     Loic Gouarin <loic.gouarin@polytechnique.edu>
+#     Benjamin Graille <benjamin.graille@universite-paris-saclay.fr>
+#     Thibaut Van Hoof <thibaut.vanhoof@cenaero.be>
+#
+# License: BSD 3 clause
+
+"""
+Execution backends of the parametric studies
+
+An executor runs func(*task) for each task and yields the results in
+the order of completion. The tasks are serialized with dill (a
+dependency of pathos) and can be executed by another process with
+
+    python -m pylbm_ui.executors task_file result_file
+
+or by the workers of a TCP work queue with
+
+    python -m pylbm_ui.executors --connect host:port --authkey key
+
+The tasks and the results are python objects unpickled by the other
+side: the work queue only accepts the workers which know its key.
+"""
+import argparse
+import os
+import queue
+import secrets
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from multiprocessing.managers import BaseManager, DictProxy
+
+import dill
+import pathos.pools as pp
+
+from .jobs import JobQueue, finished_states
+from .workers import env_worker_index
+
+backends = ['local pool', 'command', 'TCP queue', 'job daemon']
+
+default_command = '{command}'
+default_address = ('localhost', 50000)
+
+
+def new_authkey():
+    """Return a random key for a TCP work queue."""
+    return secrets.token_hex(16)
+
+
+def dump_task(func, task, env=None):
+    """Serialize the call func(*task) with the environment variables env."""
+    return dill.dumps({'func': func, 'task': task, 'env': env or {}})
+
+
+def run_task(data):
+    """
+    Run a task serialized by dump_task and return the serialized result
+    or the traceback of the error.
+    """
+    try:
+        task = dill.loads(data)
+        os.environ.update(task['env'])
+        return dill.dumps({'result': task['func'](*task['task'])})
+    except Exception:
+        return dill.dumps({'error': traceback.format_exc()})
+
+
+def call_with_env(func, env, *task):
+    """Run func(*task) with the environment variables env."""
+    os.environ.update(env)
+    return func(*task)
+
+
+def load_result(data):
+    """Return the result serialized by run_task."""
+    result = dill.loads(data)
+    if 'error' in result:
+        raise RuntimeError(f'a sample of the parametric study failed:\n{result["error"]}')
+    return result['result']
+
+
+class Executor:
+    """
+    Base class of the execution backends.
+
+    The local executors share the files of the process running the
+    study: the others need a directory visible by all the machines.
+    """
+    local = True
+
+    def map(self, func, tasks, env=None):
+        """
+        Run func(*task) for each task and yield the results in the
+        order of completion.
+        """
+        pass
+
+    def clear(self):
+        """Restart the workers (for the executors which keep them)."""
+        pass
+
+    def close(self):
+        pass
+
+
+class LocalPoolExecutor(Executor):
+    """
+    Run the tasks in a local pathos ProcessPool.
+
+    Parameters
+    ==========
+
+    - n_workers: int
+        the number of processes.
+
+    """
+    def __init__(self, n_workers):
+        self.n_workers = n_workers
+
+    def pool(self):
+        return pp.ProcessPool(nodes=self.n_workers)
+
+    def map(self, func, tasks, env=None):
+        # the environment is set in the workers only: the process
+        # running the study keeps its own
+        n = len(tasks)
+        # each free worker takes the next task
+        return self.pool().uimap(call_with_env, [func]*n, [env or {}]*n, *[list(a) for a in zip(*tasks)])
+
+    def clear(self):
+        # the next map forks new workers
+        self.pool().clear()
+
+
+class CommandExecutor(Executor):
+    """
+    Submit a command by task.
+
+    The task and its result are exchanged through files in directory.
+    The command is given by a template where {command} is replaced by
+    the command which runs the task. For example
+
+        'sbatch --job-name=simu_{id} --wrap "{command}"'
+
+    submits a SLURM job by task and '{command}' runs the tasks on the
+    local machine. {python}, {task}, {result} and {id} are also replaced
+    by the python interpreter, the files of the task and of its result
+    and the index of the task.
+
+    Each running task gets a slot in [0, max_jobs) as its worker index
+    (see workers.worker_index) so that the pinned tasks don't share
+    their cpus.
+
+    Parameters
+    ==========
+
+    - directory: str
+        the directory of the files of the tasks: it must be visible
+        by the machines which run the tasks.
+
+    - command: str
+        the template of the command (default is '{command}').
+
+    - max_jobs: int
+        the maximum number of commands running at the same time
+        (default is None: no limit).
+
+    - poll: float
+        the time in seconds between two checks of the results
+        (default is 1).
+
+    - timeout: float
+        the maximum time in seconds to wait for a result after the
+        end of its command (default is None: no limit).
+
+    """
+    local = False
+
+    def __init__(self, directory, command=default_command, max_jobs=None, poll=1., timeout=None):
+        self.directory = directory
+        self.command = command
+        self.max_jobs = max_jobs
+        self.poll = poll
+        self.timeout = timeout
+
+    def task_command(self, task_file, result_file):
+        return ' '.join(shlex.quote(a) for a in [
+            sys.executable, '-m', 'pylbm_ui.executors', task_file, result_file
+        ])
+
+    def submit(self, index, func, task, env, slot):
+        task_file = os.path.join(self.directory, f'task_{index}.pkl')
+        result_file = os.path.join(self.directory, f'result_{index}.pkl')
+        if os.path.exists(result_file):
+            os.remove(result_file)
+        env = dict(env or {}, **{env_worker_index: str(slot)})
+        with open(task_file, 'wb') as f:
+            f.write(dump_task(func, task, env))
+
+        command = self.command.format(
+            command=self.task_command(task_file, result_file),
+            python=sys.executable,
+            task=task_file,
+            result=result_file,
+            id=index,
+        )
+        return subprocess.Popen(command, shell=True), task_file, result_file
+
+    def map(self, func, tasks, env=None):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+        waiting = list(enumerate(tasks))
+        running = {}
+        slots = {}
+        submitted = {}
+        while waiting or running or submitted:
+            while waiting and (self.max_jobs is None or len(running) < self.max_jobs):
+                index, task = waiting.pop(0)
+                if self.max_jobs is None:
+                    slots[index] = index
+                else:
+                    slots[index] = min(set(range(self.max_jobs)) - set(slots.values()))
+                process, task_file, result_file = self.submit(index, func, task, env, slots[index])
+                running[index] = process
+                submitted[index] = (task_file, result_file, None)
+
+            for index, process in list(running.items()):
+                returncode = process.poll()
+                if returncode is not None:
+                    del running[index]
+                    del slots[index]
+                    task_file, result_file, _ = submitted[index]
+                    if returncode != 0 and not os.path.exists(result_file):
+                        raise RuntimeError(
+                            f'the command of the task {index} failed with the code {returncode}'
+                        )
+                    submitted[index] = (task_file, result_file, time.time())
+
+            done = False
+            for index, (task_file, result_file, end) in list(submitted.items()):
+                if os.path.exists(result_file):
+                    with open(result_file, 'rb') as f:
+                        data = f.read()
+                    del submitted[index]
+                    if running.pop(index, None) is not None:
+                        del slots[index]
+                    os.remove(task_file)
+                    os.remove(result_file)
+                    done = True
+                    yield load_result(data)
+                elif end is not None and self.timeout is not None and time.time() - end > self.timeout:
+                    raise RuntimeError(f'no result for the task {index} after {self.timeout}s')
+
+            if not done:
+                time.sleep(self.poll)
+
+
+class JobDaemonExecutor(Executor):
+    """
+    Submit the tasks to the job daemon (see jobs.py) which runs them
+    outside of the kernel: the simulations go on if the kernel stops.
+
+    Parameters
+    ==========
+
+    - queue: JobQueue
+        the queue of the daemon (default is the queue in the default path).
+
+    - max_jobs: int
+        the number of jobs running at the same time if the daemon is
+        started by this executor (default is None: see start_daemon).
+
+    - poll: float
+        the time in seconds between two checks of the jobs (default is 1).
+
+    """
+    local = False
+
+    def __init__(self, queue=None, max_jobs=None, poll=1.):
+        self.queue = queue or JobQueue()
+        self.max_jobs = max_jobs
+        self.poll = poll
+
+    def start(self):
+        """
+        Start the daemon if it's not running and return the number of
+        jobs it runs at the same time.
+        """
+        return self.queue.start_daemon(self.max_jobs)
+
+    def map(self, func, tasks, env=None):
+        self.start()
+        pending = [
+            self.queue.submit('task', {'index': i}, dump_task(func, task, env))
+            for i, task in enumerate(tasks)
+        ]
+        try:
+            while pending:
+                finished = [j for j in pending if self.queue.status(j)['state'] in finished_states]
+                for job_id in finished:
+                    pending.remove(job_id)
+                    status = self.queue.status(job_id)
+                    data = self.queue.result(job_id)
+                    self.queue.remove(job_id)
+                    if data is None:
+                        raise RuntimeError(f"the job {job_id} is {status['state']}: {status.get('message', '')}")
+                    yield load_result(data)
+                if not finished:
+                    time.sleep(self.poll)
+        finally:
+            # the study is stopped: the remaining jobs are useless
+            for job_id in pending:
+                self.queue.cancel(job_id)
+
+
+# the queues of the TCP work queue and the heartbeats of its workers:
+# they live in the server process
+_tasks = queue.Queue()
+_results = queue.Queue()
+_workers = {}
+
+
+def _get_tasks():
+    return _tasks
+
+
+def _get_results():
+    return _results
+
+
+def _get_workers():
+    return _workers
+
+
+class QueueManager(BaseManager):
+    pass
+
+
+QueueManager.register('get_tasks', callable=_get_tasks)
+QueueManager.register('get_results', callable=_get_results)
+QueueManager.register('get_workers', callable=_get_workers, proxytype=DictProxy)
+
+
+class TCPQueueExecutor(Executor):
+    """
+    Serve the tasks with a TCP work queue that workers on other
+    machines can join with
+
+        python -m pylbm_ui.executors --connect host:port --authkey key
+
+    The workers leave when the study is finished.
+
+    The workers send a heartbeat while they are connected: if a worker
+    running a task stops, or if all the local workers have stopped
+    while no other worker is connected, the study fails instead of
+    waiting for its result.
+
+    Parameters
+    ==========
+
+    - address: tuple
+        the address (host, port) of the queue (default is
+        ('localhost', 50000)): use the name of the machine or '' to
+        accept the workers of the other machines.
+
+    - authkey: str
+        the key shared with the workers (default is None: a random key
+        is generated).
+
+    - local_workers: int
+        the number of workers started on this machine (default is 0).
+
+    - poll: float
+        the time in seconds between two checks of the workers
+        (default is 1).
+
+    - heartbeat: float
+        the time in seconds after which a silent worker is considered
+        as stopped (default is 60).
+
+    - timeout: float
+        the maximum time in seconds to wait for a result (default is
+        None: no limit).
+
+    """
+    local = False
+
+    def __init__(self, address=default_address, authkey=None, local_workers=0, poll=1., heartbeat=60., timeout=None):
+        self.address = address
+        self.authkey = authkey or new_authkey()
+        self.local_workers = local_workers
+        self.poll = poll
+        self.heartbeat = heartbeat
+        self.timeout = timeout
+        self.manager = None
+        self.workers = []
+
+    def start(self):
+        self.manager = QueueManager(address=self.address, authkey=self.authkey.encode())
+        self.manager.start()
+        host, port = self.manager.address
+        for index in range(self.local_workers):
+            self.workers.append(subprocess.Popen([
+                sys.executable, '-m', 'pylbm_ui.executors',
+                '--connect', f'{host or "localhost"}:{port}', '--authkey', self.authkey,
+                '--index', str(index)
+            ]))
+
+    def check_workers(self, workers, pending):
+        """
+        Raise an error if a worker has stopped while it was running one
+        of the pending tasks or if no worker is left to run them.
+        """
+        now = time.time()
+        beats = workers.copy()
+        for name, (beat, index) in beats.items():
+            if index in pending and now - beat > self.heartbeat:
+                raise RuntimeError(f'the worker {name} has stopped while running the task {index}')
+        if self.workers and all(w.poll() is not None for w in self.workers):
+            if all(now - beat > self.heartbeat for beat, _ in beats.values()):
+                raise RuntimeError('the local workers have stopped and no other worker is connected')
+
+    def map(self, func, tasks, env=None):
+        if self.manager is None:
+            self.start()
+        try:
+            task_queue = self.manager.get_tasks()
+            result_queue = self.manager.get_results()
+            workers = self.manager.get_workers()
+            for index, task in enumerate(tasks):
+                task_queue.put((index, dump_task(func, task, env)))
+            pending = set(range(len(tasks)))
+            last = time.time()
+            while pending:
+                try:
+                    index, data = result_queue.get(timeout=self.poll)
+                except queue.Empty:
+                    self.check_workers(workers, pending)
+                    if self.timeout is not None and time.time() - last > self.timeout:
+                        raise RuntimeError(f'no result of the work queue after {self.timeout}s')
+                    continue
+                pending.discard(index)
+                last = time.time()
+                yield load_result(data)
+        finally:
+            self.close()
+
+    def close(self):
+        if self.manager is not None:
+            self.manager.shutdown()
+            self.manager = None
+        for worker in self.workers:
+            worker.wait()
+        self.workers = []
+
+
+def queue_worker(address, authkey, poll=1.):
+    """Run the tasks of a TCP work queue until the queue is closed."""
+    manager = QueueManager(address=address, authkey=authkey.encode())
+    manager.connect()
+    task_queue = manager.get_tasks()
+    result_queue = manager.get_results()
+    workers = manager.get_workers()
+    name = f'{socket.gethostname()}:{os.getpid()}'
+    current = [None]
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(poll):
+            try:
+                workers[name] = (time.time(), current[0])
+            except (EOFError, OSError):
+                return
+
+    thread = threading.Thread(target=heartbeat, daemon=True)
+    thread.start()
+    try:
+        while True:
+            try:
+                index, data = task_queue.get(timeout=poll)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                # the study is finished
+                return
+            try:
+                current[0] = index
+                workers[name] = (time.time(), index)
+                result = run_task(data)
+                current[0] = None
+                result_queue.put((index, result))
+            except (EOFError, OSError):
+                return
+    finally:
+        stop.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='run the tasks of a parametric study')
+    parser.add_argument('task', nargs='?', help='file of the task to run')
+    parser.add_argument('result', nargs='?', help='file of the result')
+    parser.add_argument('--connect', help='address host:port of a TCP work queue to join', type=str, default=None)
+    parser.add_argument('--authkey', help='key of the TCP work queue', type=str, default=None)
+    parser.add_argument('--index', help='index of this worker on its machine, used to pin it', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.index is not None:
+        os.environ[env_worker_index] = str(args.index)
+
+    if args.connect:
+        if not args.authkey:
+            parser.error('the key of the TCP work queue is required')
+        host, port = args.connect.rsplit(':', 1)
+        queue_worker((host, int(port)), args.authkey)
+        return
+
+    if args.task is None or args.result is None:
+        parser.error('the files of the task and of the result are required')
+
+    with open(args.task, 'rb') as f:
+        result = run_task(f.read())
+    # the result appears only once it's complete
+    with open(args.result + '.part', 'wb') as f:
+        f.write(result)
+    os.replace(args.result + '.part', args.result)
+
+
+if __name__ == '__main__':
+    main()
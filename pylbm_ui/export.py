@@ -0,0 +1,169 @@
+# Authors:
+#     Loic Gouarin <loic.gouarin@polytechnique.edu>
+#     Benjamin Graille <benjamin.graille@universite-paris-saclay.fr>
+#     Thibaut Van Hoof <thibaut.vanhoof@cenaero.be>
+#
+# License: BSD 3 clause
+
+import os
+import threading
+import zipfile
+
+from .config import default_path
+from .results_index import index_filename
+
+# files which are not compressed again in the archive: compressed
+# formats and hdf5 files whose binary content doesn't deflate well
+stored_extensions = [
+    '.h5', '.png', '.jpg', '.jpeg', '.gif', '.gz', '.bz2', '.xz', '.zip', '.npz'
+]
+
+
+def collect_files(path, subsets=None):
+    """
+    Return the list of the files to export with their size.
+
+    Parameters
+    ==========
+
+    - path: str
+        the root of the output directory.
+
+    - subsets: list
+        the directories to export relative to path. If None or empty,
+        all the output directory is exported.
+
+    """
+    roots = [os.path.join(path, s) for s in subsets] if subsets else [path]
+    roots = [os.path.normpath(r) for r in roots]
+    # don't export twice a directory included in another one
+    roots = [
+        r for r in roots
+        if not any(r != o and r.startswith(o + os.sep) for o in roots)
+    ]
+
+    files = []
+    for root in sorted(set(roots)):
+        for folder, _, filenames in os.walk(root):
+            for filename in sorted(filenames):
+                if filename.startswith(index_filename):
+                    continue
+                filepath = os.path.join(folder, filename)
+                try:
+                    files.append((filepath, os.path.getsize(filepath)))
+                except OSError:
+                    pass
+    return files
+
+
+def compress_type(filename):
+    """Return the zip compression method to use for filename."""
+    if os.path.splitext(filename)[1].lower() in stored_extensions:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+class ZipExport:
+    """
+    Build a zip archive of the results in a background thread.
+
+    Parameters
+    ==========
+
+    - path: str
+        the root of the output directory (default is default_path).
+
+    - on_progress: callable
+        called with the number of bytes written and the total number of
+        bytes to write each time a file is added to the archive.
+
+    - on_done: callable
+        called with the name of the archive when it's complete or with
+        None if the export has been cancelled or has failed.
+
+    """
+    def __init__(self, path=default_path, on_progress=None, on_done=None):
+        self.path = path
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.thread = None
+        self.error = None
+        self._last_progress = 0
+        self._cancel = threading.Event()
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, zipfilename, subsets=None):
+        """
+        Start the export of the directories subsets in zipfilename.
+
+        The archive is written in a temporary file which replaces
+        zipfilename at the end so that an incomplete archive is never
+        downloaded.
+        """
+        if self.running:
+            return
+        self._cancel.clear()
+        self.error = None
+        self.thread = threading.Thread(
+            target=self._run, args=(zipfilename, subsets), daemon=True
+        )
+        self.thread.start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _run(self, zipfilename, subsets):
+        from .json import compact_journals
+
+        tmpfilename = zipfilename + '.part'
+        result = None
+        try:
+            # merge the run journals so that the archive has complete json files
+            for subset in subsets or ['']:
+                compact_journals(os.path.join(self.path, subset))
+            files = collect_files(self.path, subsets)
+            total = sum(size for _, size in files)
+            done = 0
+            self._progress(done, total)
+            with zipfile.ZipFile(tmpfilename, 'w', allowZip64=True) as zip_obj:
+                for filepath, size in files:
+                    if self._cancel.is_set():
+                        break
+                    if os.path.abspath(filepath) == os.path.abspath(tmpfilename):
+                        continue
+                    try:
+                        zip_obj.write(
+                            filepath,
+                            os.path.relpath(filepath, self.path),
+                            compress_type=compress_type(filepath)
+                        )
+                    except OSError:
+                        # the file has been removed since the listing
+                        pass
+                    done += size
+                    self._progress(done, total)
+
+            if self._cancel.is_set():
+                os.remove(tmpfilename)
+            else:
+                os.replace(tmpfilename, zipfilename)
+                result = zipfilename
+        except Exception as e:
+            self.error = e
+            if os.path.exists(tmpfilename):
+                os.remove(tmpfilename)
+        finally:
+            if self.on_done is not None:
+                self.on_done(result)
+
+    def _progress(self, done, total):
+        # avoid flooding the frontend when there are a lot of small files
+        step = total // 200
+        if self.on_progress is not None and (
+            done == 0 or done == total or done - self._last_progress >= step
+        ):
+            self._last_progress = done
+            self.on_progress(done, total)
@@ -0,0 +1,217 @@
+# Authors:
+#     Loic Gouarin <loic.gouarin@polytechnique.edu>
+#     Benjamin Graille <benjamin.graille@universite-paris-saclay.fr>
+#     Thibaut Van Hoof <thibaut.vanhoof@cenaero.be>
+#
+# License: BSD 3 clause
+
+import os
+import weakref
+from collections import OrderedDict
+
+import h5py
+import numpy as np
+
+_caches = weakref.WeakSet()
+
+
+def compute_bounds(data):
+    """
+    Return the minimum and the maximum of the finite values of data
+    or None if there is no finite value.
+    """
+    data = np.asarray(data)
+    finite = data[np.isfinite(data)]
+    if finite.size == 0:
+        return None
+    return float(finite.min()), float(finite.max())
+
+
+def get_offset(dset):
+    """
+    Return the offset in bytes of the data of a hdf5 dataset in its file
+    or None if the dataset can't be mapped in memory (chunked, compressed
+    or not allocated yet).
+    """
+    if dset.chunks is not None or dset.compression is not None or dset.size == 0:
+        return None
+    return dset.id.get_offset()
+
+
+def write_metadata(filename, bounds):
+    """
+    Store the minimum and the maximum of the fields of a hdf5 file
+    and the offset of the contiguous datasets as attributes.
+
+    The datasets written by pylbm are contiguous and uncompressed,
+    the offset allows to open them with numpy.memmap.
+
+    Parameters
+    ==========
+
+    - filename: str
+        the hdf5 file.
+
+    - bounds: dict
+        the keys are the names of the datasets and the values
+        are the (min, max) given by compute_bounds.
+
+    """
+    release(filename)
+    with h5py.File(filename, 'r+') as h5_data:
+        for name, bound in bounds.items():
+            if name in h5_data and bound is not None:
+                h5_data[name].attrs['min'] = bound[0]
+                h5_data[name].attrs['max'] = bound[1]
+        for dset in h5_data.values():
+            if isinstance(dset, h5py.Dataset):
+                offset = get_offset(dset)
+                if offset is not None:
+                    dset.attrs['offset'] = offset
+
+
+def release(filename):
+    """
+    Close the hdf5 file filename in all the caches.
+
+    This must be called before writing a file which may have been opened
+    for reading since hdf5 can't open the same file twice in the same
+    process with different modes.
+    """
+    filename = os.path.abspath(filename)
+    for cache in list(_caches):
+        if filename in cache._files:
+            cache._close(filename)
+        cache._drop(filename)
+
+
+class H5Cache:
+    """
+    Pool of opened hdf5 files and cache of the datasets already read.
+
+    The files are kept opened and closed in least recently used order
+    when there are more than max_files opened. The arrays read are
+    kept in memory, also in least recently used order, until their
+    total size exceeds max_bytes. A file is opened and read again
+    if it has been modified on disk.
+
+    Parameters
+    ==========
+
+    - max_files: int
+        the maximum number of opened files (default is 8).
+
+    - max_bytes: int
+        the maximum memory used by the cached arrays (default is 512 MB).
+
+    - memmap: bool
+        if True, the contiguous datasets are opened with numpy.memmap
+        instead of being read in memory (default is False).
+
+    """
+    def __init__(self, max_files=8, max_bytes=512*2**20, memmap=False):
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.memmap = memmap
+        self._files = OrderedDict()
+        self._arrays = OrderedDict()
+        self._nbytes = 0
+        _caches.add(self)
+
+    def file(self, filename):
+        """Return the opened hdf5 file filename."""
+        filename = os.path.abspath(filename)
+        key = self._stat(filename)
+
+        if filename in self._files:
+            h5_data, old_key = self._files[filename]
+            if old_key == key:
+                self._files.move_to_end(filename)
+                return h5_data
+            self._close(filename)
+
+        h5_data = h5py.File(filename, 'r')
+        self._files[filename] = (h5_data, key)
+        while len(self._files) > self.max_files:
+            self._close(next(iter(self._files)))
+        return h5_data
+
+    def read(self, filename, name):
+        """
+        Return the dataset name of the hdf5 file filename as a read-only
+        numpy array.
+
+        The file is not opened if the array is already in the cache
+        and the file has not been modified since.
+        """
+        filename = os.path.abspath(filename)
+        key = (filename, name)
+        stat = self._stat(filename)
+
+        if key in self._arrays:
+            old_stat, data = self._arrays[key]
+            if old_stat == stat:
+                self._arrays.move_to_end(key)
+                return data
+            self._nbytes -= self._arrays.pop(key)[1].nbytes
+
+        dset = self.file(filename)[name]
+        data = None
+        if self.memmap:
+            data = self._open_memmap(filename, dset)
+        if data is None:
+            data = dset[...]
+            data.flags.writeable = False
+        self._arrays[key] = (stat, data)
+        self._nbytes += data.nbytes
+
+        while self._nbytes > self.max_bytes and len(self._arrays) > 1:
+            _, (_, old) = self._arrays.popitem(last=False)
+            self._nbytes -= old.nbytes
+        return data
+
+    def bounds(self, filename, name):
+        """
+        Return the minimum and the maximum of the dataset name.
+
+        The attributes written at save time are used if they exist,
+        otherwise the data is read.
+        """
+        attrs = self.file(filename)[name].attrs
+        if 'min' in attrs and 'max' in attrs:
+            return float(attrs['min']), float(attrs['max'])
+        bound = compute_bounds(self.read(filename, name))
+        return bound if bound is not None else (np.nan, np.nan)
+
+    def close(self):
+        """Close all the opened files and drop the cached arrays."""
+        for filename in list(self._files):
+            self._close(filename)
+        self._arrays.clear()
+        self._nbytes = 0
+
+    def _open_memmap(self, filename, dset):
+        offset = dset.attrs.get('offset', None)
+        if offset is None:
+            offset = get_offset(dset)
+        if offset is None:
+            return None
+        return np.memmap(
+            filename, mode='r', dtype=dset.dtype,
+            shape=dset.shape, offset=int(offset)
+        )
+
+    def _drop(self, filename):
+        for key in [k for k in self._arrays if k[0] == filename]:
+            self._nbytes -= self._arrays.pop(key)[1].nbytes
+
+    def _stat(self, filename):
+        stat = os.stat(filename)
+        return stat.st_mtime, stat.st_size
+
+    def _close(self, filename):
+        h5_data, _ = self._files.pop(filename)
+        try:
+            h5_data.close()
+        except Exception:
+            pass
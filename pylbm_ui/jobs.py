@@ -0,0 +1,535 @@
+# Authors:
+#     Loic Gouarin <loic.gouarin@polytechnique.edu>
+#     Benjamin Graille <benjamin.graille@universite-paris-saclay.fr>
+#     Thibaut Van Hoof <thibaut.vanhoof@cenaero.be>
+#
+# License: BSD 3 clause
+
+"""
+Job daemon running the simulations outside of the Voila kernel
+
+The jobs are exchanged through a file queue: each job is a directory
+of the jobs path with
+
+- job.json: the kind and the description of the job,
+- task.pkl: the serialized call of the 'task' jobs (see executors.py),
+- status.json: the state and the progress of the job,
+- result.pkl: the result of the 'task' jobs,
+- cancel: created to ask the job to stop.
+
+The daemon is started by the UI when needed (see start_daemon) or with
+
+    python -m pylbm_ui.jobs
+
+It runs each job in its own process so that a job which crashes
+doesn't stop the daemon, and the UI can reattach to the running jobs
+by reading their status.
+
+The daemon holds a lock on daemon.lock while it runs so that only one
+daemon scans the queue, and the status of a job is modified under the
+lock of the job so that the daemon, the job and the UI don't overwrite
+their changes.
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import traceback
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+
+from .config import default_path, nb_split_period
+from .workers import env_worker_index
+
+jobs_path = os.path.join(default_path, '.jobs')
+
+queued, running, done, failed, cancelled = 'queued', 'running', 'done', 'failed', 'cancelled'
+finished_states = [done, failed, cancelled]
+
+
+def write_json(filename, data):
+    """Write a json file atomically."""
+    with open(filename + '.part', 'w') as f:
+        json.dump(data, f, sort_keys=True, indent=4)
+    os.replace(filename + '.part', filename)
+
+
+def lock_file(f, blocking=True):
+    """
+    Take an exclusive lock on the open file f and return False if it's
+    held by another process and blocking is False.
+    """
+    try:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+    except OSError:
+        if blocking:
+            raise
+        return False
+    return True
+
+
+def unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(filename):
+    """Hold an exclusive lock on filename, created if needed."""
+    with open(filename, 'a+') as f:
+        lock_file(f)
+        try:
+            yield
+        finally:
+            unlock_file(f)
+
+
+def pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """
+    The file queue of the jobs.
+
+    Parameters
+    ==========
+
+    - path: str
+        the directory of the jobs (default is jobs_path).
+
+    """
+    def __init__(self, path=jobs_path):
+        self.path = path
+
+    def job_path(self, job_id, filename=''):
+        return os.path.join(self.path, job_id, filename)
+
+    def submit(self, kind, spec, task=None):
+        """
+        Add a job to the queue and return its id.
+
+        Parameters
+        ==========
+
+        - kind: str
+            'simulation' or 'task'.
+
+        - spec: dict
+            the description of the job.
+
+        - task: bytes
+            the serialized call of a 'task' job (see executors.dump_task).
+
+        """
+        job_id = f'{time.strftime("%Y%m%d-%H%M%S")}-{time.time_ns() % 10**9:09d}-{os.getpid()}'
+        # the job is written in a temporary directory so that the
+        # daemon never reads an incomplete job
+        tmp_path = os.path.join(self.path, f'.{job_id}')
+        os.makedirs(tmp_path)
+        if task is not None:
+            with open(os.path.join(tmp_path, 'task.pkl'), 'wb') as f:
+                f.write(task)
+        write_json(os.path.join(tmp_path, 'job.json'), {'kind': kind, 'spec': spec, 'submitted': time.time()})
+        write_json(os.path.join(tmp_path, 'status.json'), {'state': queued, 'progress': 0})
+        os.replace(tmp_path, self.job_path(job_id))
+        return job_id
+
+    def jobs(self, states=None):
+        """Return the ids of the jobs in the order of submission."""
+        if not os.path.isdir(self.path):
+            return []
+        job_ids = sorted(
+            d for d in os.listdir(self.path)
+            if not d.startswith('.') and os.path.isfile(self.job_path(d, 'job.json'))
+        )
+        if states is not None:
+            job_ids = [j for j in job_ids if self.status(j).get('state') in states]
+        return job_ids
+
+    def job(self, job_id):
+        with open(self.job_path(job_id, 'job.json')) as f:
+            return json.load(f)
+
+    def status(self, job_id):
+        """
+        Return the status of a job: its state, its progress in percent
+        and the information given by the job.
+
+        A running job whose process has disappeared is failed.
+        """
+        try:
+            with open(self.job_path(job_id, 'status.json')) as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            return {'state': failed, 'progress': 0, 'message': 'no status'}
+        if status['state'] == running and status.get('pid') and not pid_alive(status['pid']):
+            status['state'] = failed
+            status['message'] = 'the process of the job has been killed'
+        return status
+
+    def set_status(self, job_id, expected=None, **kwargs):
+        """
+        Update the status of a job and return True.
+
+        If expected is given, the status is only updated if the state
+        of the job is in expected: False is returned otherwise.
+        """
+        with file_lock(self.job_path(job_id, 'status.lock')):
+            status = self.status(job_id)
+            if expected is not None and status['state'] not in expected:
+                return False
+            status.update(kwargs, updated=time.time())
+            write_json(self.job_path(job_id, 'status.json'), status)
+        return True
+
+    def cancel(self, job_id):
+        """Ask a job to stop: a queued job is never started."""
+        open(self.job_path(job_id, 'cancel'), 'w').close()
+        self.set_status(job_id, expected=[queued], state=cancelled)
+
+    def is_cancelled(self, job_id):
+        return os.path.exists(self.job_path(job_id, 'cancel'))
+
+    def result(self, job_id):
+        """Return the result of a finished 'task' job or None."""
+        filename = self.job_path(job_id, 'result.pkl')
+        if not os.path.exists(filename):
+            return None
+        with open(filename, 'rb') as f:
+            return f.read()
+
+    def remove(self, job_id):
+        import shutil
+        shutil.rmtree(self.job_path(job_id), ignore_errors=True)
+
+    def daemon_info(self):
+        """Return the pid and the max_jobs of the last daemon started."""
+        try:
+            with open(os.path.join(self.path, 'daemon.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def daemon_pid(self):
+        pid = self.daemon_info().get('pid')
+        return pid if pid is not None and pid_alive(pid) else None
+
+    def daemon_running(self):
+        """Check if a daemon holds the lock of this queue."""
+        try:
+            f = open(os.path.join(self.path, 'daemon.lock'), 'a+')
+        except OSError:
+            return False
+        with f:
+            if lock_file(f, blocking=False):
+                unlock_file(f)
+                return False
+        return True
+
+    def start_daemon(self, max_jobs=None):
+        """
+        Start the daemon of this queue if it's not running.
+
+        The daemon runs max_jobs jobs at the same time (default is the
+        half of the number of cpus).
+
+        The daemon is detached from the current process: it survives
+        the kernel which has started it.
+
+        Return the number of jobs run at the same time by the daemon:
+        it differs from max_jobs if a daemon was already running with
+        another number (None if it's unknown).
+        """
+        if not os.path.exists(self.path):
+            os.makedirs(self.path, exist_ok=True)
+        if max_jobs is None:
+            max_jobs = max(1, (os.cpu_count() or 1)//2)
+
+        # the other callers wait until the daemon started here holds its
+        # lock: a second daemon would stop at once anyway
+        with file_lock(os.path.join(self.path, 'start.lock')):
+            if not self.daemon_running():
+                process = subprocess.Popen(
+                    [sys.executable, '-m', 'pylbm_ui.jobs', '--path', self.path, '--max-jobs', str(max_jobs)],
+                    cwd=os.getcwd(),
+                    stdin=subprocess.DEVNULL,
+                    stdout=open(os.path.join(self.path, 'daemon.log'), 'a'),
+                    stderr=subprocess.STDOUT,
+                    start_new_session=True,
+                )
+                # the daemon writes daemon.json once it holds its lock
+                timeout = time.time() + 60
+                while self.daemon_info().get('pid') != process.pid and process.poll() is None and time.time() < timeout:
+                    time.sleep(0.1)
+            return self.daemon_info().get('max_jobs')
+
+
+class JobDaemon:
+    """
+    Run the jobs of a queue in the order of submission.
+
+    Parameters
+    ==========
+
+    - queue: JobQueue
+        the queue of the jobs.
+
+    - max_jobs: int
+        the number of jobs running at the same time (default is 1).
+
+    - poll: float
+        the time in seconds between two scans of the queue (default is 1).
+
+    Each running job gets a slot in [0, max_jobs) as its worker index
+    (see workers.worker_index) so that the pinned jobs don't share
+    their cpus.
+
+    """
+    def __init__(self, queue, max_jobs=1, poll=1.):
+        self.queue = queue
+        self.max_jobs = max_jobs
+        self.poll = poll
+        self.processes = {}
+        self.slots = {}
+
+    def start_job(self, job_id):
+        """Start a queued job and return False if it's not queued anymore."""
+        # the job writes its pid itself: it may finish before Popen returns
+        if not self.queue.set_status(job_id, expected=[queued], state=running, pid=None, started=time.time()):
+            return False
+        slot = min(set(range(self.max_jobs)) - set(self.slots.values()))
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'pylbm_ui.jobs', '--path', self.queue.path, '--run', job_id],
+            cwd=os.getcwd(),
+            env=dict(os.environ, **{env_worker_index: str(slot)}),
+        )
+        self.processes[job_id] = process
+        self.slots[job_id] = slot
+        return True
+
+    def reap(self):
+        for job_id, process in list(self.processes.items()):
+            if process.poll() is not None:
+                del self.processes[job_id]
+                del self.slots[job_id]
+                self.queue.set_status(
+                    job_id, expected=[running], state=failed,
+                    message=f'the job exited with the code {process.returncode}'
+                )
+
+    def run(self):
+        """
+        Run the jobs until the daemon is killed. Return at once if
+        another daemon runs the queue.
+        """
+        if not os.path.exists(self.queue.path):
+            os.makedirs(self.queue.path, exist_ok=True)
+        lock = open(os.path.join(self.queue.path, 'daemon.lock'), 'a+')
+        if not lock_file(lock, blocking=False):
+            lock.close()
+            return
+        # the callers of start_daemon read the number of jobs of the
+        # running daemon in this file
+        filename = os.path.join(self.queue.path, 'daemon.json')
+        with open(filename + '.part', 'w') as f:
+            json.dump({'pid': os.getpid(), 'max_jobs': self.max_jobs}, f)
+        os.replace(filename + '.part', filename)
+
+        while True:
+            self.reap()
+            for job_id in self.queue.jobs([queued]):
+                if len(self.processes) >= self.max_jobs:
+                    break
+                if self.queue.is_cancelled(job_id):
+                    self.queue.set_status(job_id, expected=[queued], state=cancelled)
+                else:
+                    self.start_job(job_id)
+            time.sleep(self.poll)
+
+
+def load_case(cfg):
+    """Return the test case and the scheme described by a simu_config.json file."""
+    import importlib
+
+    objects = []
+    for name in ['test_case', 'lb_scheme']:
+        module = importlib.import_module(cfg[name]['module'])
+        objects.append(getattr(module, cfg[name]['class'])(**cfg[name]['args']))
+    return objects
+
+
+def run_simulation_job(queue, job_id, spec):
+    """
+    Run the simulation described by spec.
+
+    The keys of spec
+    ================
+
+    - path: str
+        the output directory of the simulation where simu_config.json
+        has been written.
+
+    - codegen: str
+        the generator used by pylbm (default is None).
+
+    - save: dict
+        the fields to save by iteration (see Save_widget.get_save_time).
+
+    - field: str
+        the field saved nb_split_period times for the plots.
+
+    - checkpoint: float
+        the period of the checkpoints in minutes (default is None: no
+        checkpoint).
+
+    - resume: bool
+        restore the checkpoint of the output directory (default is False).
+
+    - steady_tol: float
+        stop the simulation at the steady state with this tolerance
+        (default is None).
+
+    """
+    from .simulation import simulation
+    from .responses import ResidualMonitor
+
+    path = spec['path']
+    with open(os.path.join(path, 'simu_config.json')) as f:
+        cfg = json.load(f)
+    test_case, lb_scheme = load_case(cfg)
+
+    simu = simulation()
+    simu.reset_fields(lb_scheme.equation.get_fields())
+    simu.reset_path(path)
+    simu.reset_sol(cfg['v_model'], test_case, lb_scheme, cfg['dx'], spec.get('codegen'))
+    if spec.get('resume') and not simu.resume():
+        raise RuntimeError(f'there is no checkpoint to resume in {path}')
+    if spec.get('checkpoint'):
+        simu.checkpoint.period = 60*spec['checkpoint']
+
+    sol = simu.sol
+    ite_to_save = {int(k): set(v) for k, v in spec.get('save', {}).items()}
+    field = spec.get('field')
+    plot_period = max(1, int(simu.duration/sol.dt/nb_split_period))
+    monitor = ResidualMonitor(spec['steady_tol']) if spec.get('steady_tol') else None
+
+    stats = {'LBM': 0}
+    nt0 = sol.nt
+    if field:
+        simu.save_data(field)
+    stop_time = simu.duration - .5*sol.dt
+    last_status = 0
+    while sol.t < stop_time:
+        if sol.nt in ite_to_save:
+            simu.save_data(ite_to_save[sol.nt])
+
+        t1 = time.time()
+        sol.one_time_step()
+        stats['LBM'] += time.time() - t1
+
+        if field and sol.nt % plot_period == 0:
+            simu.save_data(field)
+        if spec.get('checkpoint'):
+            simu.checkpoint(sol)
+        if monitor is not None and monitor(simu.duration, sol):
+            stats['steady_time'] = sol.t
+            break
+
+        if time.time() - last_status > 1:
+            last_status = time.time()
+            if queue.is_cancelled(job_id):
+                break
+            queue.set_status(
+                job_id, progress=100*sol.t/simu.duration, t=sol.t, nt=sol.nt,
+                mlups=float((sol.nt - nt0)*np.prod(sol.domain.shape_in)/max(stats['LBM'], 1e-12)/1e6)
+            )
+
+    if field:
+        simu.save_data(field)
+    if sol.nt in ite_to_save:
+        simu.save_data(ite_to_save[sol.nt])
+    if spec.get('checkpoint'):
+        simu.checkpoint.save(sol)
+
+    stats['MLUPS'] = (sol.nt - nt0)*np.prod(sol.domain.shape_in)/max(stats['LBM'], 1e-12)/1e6
+    simu.save_stats(stats)
+    queue.set_status(
+        job_id, progress=100*min(sol.t/simu.duration, 1), t=sol.t, nt=sol.nt,
+        mlups=float(stats['MLUPS'])
+    )
+
+
+def run_job(queue, job_id):
+    """Run a job of the queue in the current process."""
+    from .executors import run_task
+
+    queue.set_status(job_id, state=running, pid=os.getpid())
+    try:
+        job = queue.job(job_id)
+        if job['kind'] == 'simulation':
+            run_simulation_job(queue, job_id, job['spec'])
+        elif job['kind'] == 'task':
+            with open(queue.job_path(job_id, 'task.pkl'), 'rb') as f:
+                result = run_task(f.read())
+            filename = queue.job_path(job_id, 'result.pkl')
+            with open(filename + '.part', 'wb') as f:
+                f.write(result)
+            os.replace(filename + '.part', filename)
+        else:
+            raise ValueError(f'unknown kind of job {job["kind"]}')
+    except Exception:
+        queue.set_status(job_id, state=failed, message=traceback.format_exc())
+        return
+    queue.set_status(job_id, state=cancelled if queue.is_cancelled(job_id) else done)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='job daemon of pylbm_ui')
+    parser.add_argument('--path', help='directory of the jobs', type=str, default=jobs_path)
+    parser.add_argument('--max-jobs', help='number of jobs running at the same time', type=int, default=max(1, (os.cpu_count() or 1)//2))
+    parser.add_argument('--run', help='run a job in this process', type=str, default=None)
+    parser.add_argument('--list', help='list the jobs', action='store_true')
+    args = parser.parse_args(argv)
+
+    queue = JobQueue(args.path)
+    if args.list:
+        for job_id in queue.jobs():
+            status = queue.status(job_id)
+            print(f"{job_id} {queue.job(job_id)['kind']:10} {status['state']:10} {status.get('progress', 0):5.1f}%")
+    elif args.run:
+        run_job(queue, args.run)
+    else:
+        # stop cleanly with kill
+        signal.signal(signal.SIGTERM, lambda *a: sys.exit(0))
+        JobDaemon(queue, args.max_jobs).run()
+
+
+if __name__ == '__main__':
+    main()
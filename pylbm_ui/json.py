@@ -7,15 +7,23 @@
 
 import json
 import os
-import numpy as np
+import time
 
 from .widgets.debug import debug_func
+from .study_store import StudyStore, load_results
+
+journal_filename = 'run_journal.jsonl'
 
 @debug_func
 def save_simu_config(path, filename, dx, model, test_case, lb_scheme, extra_config=None, responses=None):
     if not os.path.exists(path):
         os.makedirs(path)
 
+    # the records of a previous run in this directory are obsolete
+    journal = os.path.join(path, journal_filename)
+    if os.path.exists(journal):
+        os.remove(journal)
+
     json.dump(
         {
             'dim': lb_scheme.dim,
@@ -44,10 +52,9 @@ def save_param_study(path, filename, dx, model, test_case, lb_scheme, param_widg
     if not os.path.exists(path):
         os.makedirs(path)
 
-    samples = {}
-    design = param_widget.design.design_space().keys()
-    for isample, sample in enumerate(sampling):
-        samples[isample] = {str(d): s for d, s in zip(design, sample)}
+    design = param_widget.get_design_space().keys()
+    store = StudyStore(path)
+    store.save_sampling(design, sampling)
 
     json.dump(
         {
@@ -69,7 +76,22 @@ def save_param_study(path, filename, dx, model, test_case, lb_scheme, param_widg
             'responses': param_widget.responses.responses_list.v_model,
             'sampling_method': param_widget.sampling_method.v_model,
             'sample_size': param_widget.sample_size.v_model,
-            'sampling': samples
+            'branching': {
+                'active': param_widget.branching.v_model,
+                'time': param_widget.branch_time.value,
+            },
+            'convergence': {
+                'active': param_widget.is_convergence_study(),
+                'ratio': param_widget.refinement_ratio.value,
+                'levels': param_widget.n_levels.value,
+            },
+            'workers': param_widget.get_worker_config().to_json(),
+            'executor': {
+                'backend': param_widget.backend.v_model,
+                'command': param_widget.submit_command.v_model,
+                'address': param_widget.queue_address.v_model,
+            },
+            'store': store.manifest(),
         },
         open(os.path.join(path, filename), 'w'),
         sort_keys=True,
@@ -78,56 +100,124 @@ def save_param_study(path, filename, dx, model, test_case, lb_scheme, param_widg
 
 @debug_func
 def save_param_study_for_simu(path, filename, design, responses):
-    if not os.path.exists(path):
-        os.makedirs(path)
+    append_journal(path, filename, {'design_space': design, 'responses': responses})
 
-    json.dump(
-        {
-            'design_space': design,
-            'responses': responses,
-        },
-        open(os.path.join(path, filename), 'w'),
-        sort_keys=True,
-        indent=4,
-    )
+def _to_json(obj):
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    return str(obj)
 
 @debug_func
-def save_stats(path, filename, stats):
+def append_journal(path, target, data, filename=journal_filename):
+    """
+    Append a record to the journal of a run.
+
+    The journal is a JSON Lines file: each record is written with a
+    single append so that concurrent writers don't need to read and
+    rewrite the json files. The records are merged in their target
+    json file by compact_journal.
+
+    Parameters
+    ==========
+
+    - path: str
+        the directory of the run.
+
+    - target: str
+        the json file where the record must be merged.
+
+    - data: dict
+        the entries to add or to replace in the target file.
+
+    """
     if not os.path.exists(path):
         os.makedirs(path)
 
-    json_data = {}
+    line = json.dumps({'file': target, 'time': time.time(), 'data': data}, sort_keys=True, default=_to_json)
+    with open(os.path.join(path, filename), 'a') as f:
+        f.write(line + '\n')
+
+def read_journal(path, filename=journal_filename):
+    """
+    Return the records of the journal of a run.
 
+    A truncated record (the writer has been killed) is ignored.
+    """
+    records = []
     file = os.path.join(path, filename)
-    if os.path.exists(file):
-        json_data = json.load(open(file, 'r'))
+    if not os.path.exists(file):
+        return records
 
-    json_data['stats'] = stats
-    json.dump(
-        json_data,
-        open(file, 'w'),
-        sort_keys=True,
-        indent=4,
-    )
+    with open(file, 'r') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                pass
+    return records
 
 @debug_func
-def save_results(path, filename, results):
-    if not os.path.exists(path):
-        os.makedirs(path)
-
-    json_data = {}
+def compact_journal(path, filename=journal_filename):
+    """
+    Merge the records of the journal of a run in their json files
+    and remove the journal.
+    """
+    if not os.path.isdir(path):
+        return
 
     file = os.path.join(path, filename)
+
+    # the records appended during the compaction go to a new journal
     if os.path.exists(file):
-        json_data = json.load(open(file, 'r'))
+        os.replace(file, f'{file}.{time.time_ns()}.compact')
 
-    json_data['results'] = [{k: v.tolist() if isinstance(v, np.ndarray) else v for k, v in r.items()} for r in results]
-    json.dump(
-        json_data,
-        open(file, 'w'),
-        sort_keys=True,
-        indent=4,
+    # the journals left by an interrupted compaction are also merged
+    pending = sorted(
+        f for f in os.listdir(path)
+        if f.startswith(filename + '.') and f.endswith('.compact')
     )
+    if not pending:
+        return
+
+    updates = {}
+    for journal in pending:
+        for record in read_journal(path, journal):
+            updates.setdefault(record['file'], {}).update(record['data'])
+
+    for target, data in updates.items():
+        target_file = os.path.join(path, target)
+        json_data = {}
+        if os.path.exists(target_file):
+            json_data = json.load(open(target_file, 'r'))
+        json_data.update(data)
+        json.dump(
+            json_data,
+            open(target_file, 'w'),
+            sort_keys=True,
+            indent=4,
+        )
+
+    for journal in pending:
+        os.remove(os.path.join(path, journal))
+
+def compact_journals(path):
+    """Compact all the journals found in the directory path."""
+    for root, _, f_names in os.walk(path):
+        if any(f.startswith(journal_filename) for f in f_names):
+            compact_journal(root)
+
+@debug_func
+def save_stats(path, filename, stats):
+    append_journal(path, filename, {'stats': stats})
+
+@debug_func
+def save_results(path, filename, results=None):
+    # the results are stored in the columnar store, the json file
+    # only keeps where to find them
+    store = StudyStore(path)
+    if results is not None:
+        store.save_results(results)
+    append_journal(path, filename, {'store': store.manifest()})
             
 @debug_func
 def save_param_study_Minamo(path, paramStudy_filename, minamo_filename, responses_widget):
@@ -286,10 +376,11 @@ def save_param_study_Minamo(path, paramStudy_filename, minamo_filename, response
                     "response-successes": [True for i in range(nResps)]}
         minamo_data["population"]["points"].append(point)       
             
-    if "results" in json_data.keys():
+    results = load_results(path, json_data)
+    if results:
         resultsDic = {}
         nPts = 0
-        for res in json_data["results"]:
+        for res in results:
             resultsDic[res["label"]] = res["values"]
             nPts = len(res["values"])
             
@@ -14,6 +14,9 @@ import copy
 import pylbm
 import re
 
+from .results_index import register_h5
+from .h5_cache import compute_bounds, write_metadata, release
+
 relax_regexp = re.compile('s_(.*)')
 
 class FromConfig:
@@ -128,7 +131,8 @@ class Stability(FromConfig):
             self.call_at = int(duration/sol.dt/10)
 
         if self.func is None:
-            func = sp.lambdify(list(self.expr.atoms(sp.Symbol)), self.expr, "numpy", dummify=False)
+            self.func = sp.lambdify(list(self.expr.atoms(sp.Symbol)), self.expr, "numpy", dummify=False)
+        func = self.func
         to_subs = {str(k): sol.m[k] for k in sol.scheme.consm.keys()}
         to_subs.update({str(k): v for k, v in sol.scheme.param.items()})
 
@@ -172,7 +176,8 @@ class Error(AfterSimulation):
 
     def __call__(self, sol):
         if self.func is None:
-            func = sp.lambdify(list(self.expr.atoms(sp.Symbol)), self.expr, "numpy", dummify=False)
+            self.func = sp.lambdify(list(self.expr.atoms(sp.Symbol)), self.expr, "numpy", dummify=False)
+        func = self.func
         to_subs = {str(k): sol.m[k] for k in sol.scheme.consm.keys()}
         to_subs.update({str(k): v for k, v in sol.scheme.param.items()})
 
@@ -205,21 +210,50 @@ class Error(AfterSimulation):
             return 'AbsError'
 
 class ErrorStd(DuringSimulation):
-    def __init__(self, field, ref_func, expr, call_at=0.92, log10=True):
+    # maximum number of values of the reference solution computed at once
+    ref_block_size = 2**22
+
+    def __init__(self, field, ref_func, expr, call_at=0.92, log10=True, ref_func_many=None):
         self.field = field
         self.ref_func = ref_func
+        self.ref_func_many = ref_func_many
         self.expr = expr
         self.log10 = log10
         self.error = []
         self.call_at = call_at
         self.error_func = None
+        self.ref_t0 = None
+        self.ref_block = None
+
+    def reference(self, duration, sol):
+        """
+        Return the reference solution at time sol.t.
+
+        If the test case can evaluate its reference solution at several
+        times, the reference solution of the next time steps until the
+        end of the simulation is computed at once.
+        """
+        domain = sol.domain
+        if self.ref_func_many is None:
+            return self.ref_func(sol.t, domain.x, field=self.field)
+
+        dt = sol.dt
+        if self.ref_block is not None:
+            k = int(round((sol.t - self.ref_t0)/dt))
+            if 0 <= k < self.ref_block.shape[0]:
+                return self.ref_block[k]
+
+        nsteps = int(np.ceil((duration - sol.t)/dt)) + 2
+        nsteps = max(1, min(nsteps, self.ref_block_size//max(domain.x.size, 1)))
+        self.ref_t0 = sol.t
+        self.ref_block = self.ref_func_many(sol.t + dt*np.arange(nsteps), domain.x, field=self.field)
+        return self.ref_block[0]
 
     def __call__(self, duration, sol):
         start_time = self.call_at*duration
 
         if sol.t >= start_time:
-            domain = sol.domain
-            ref_solution = self.ref_func(sol.t, domain.x, field=self.field)
+            ref_solution = self.reference(duration, sol)
 
             if self.error_func is None:
                 self.error_func = Error(ref_solution, self.expr, log10=False, relative=False)
@@ -245,6 +279,106 @@ class ErrorAvg(ErrorStd):
     def __str__(self):
         return f'AvgErr_{self.field}'
 
+class ResidualMonitor:
+    """
+    Detect that a simulation has reached a steady state.
+
+    The conserved moments are compared between two checkpoints: the
+    residual is the largest relative change of the moments on the fluid
+    cells divided by the time between the checkpoints. The simulation is
+    steady when the residual is smaller than the tolerance.
+
+    Parameters
+    ==========
+
+    - tol: float
+        the tolerance on the residual (default is 1e-4).
+
+    - n_checks: int
+        the number of checkpoints over the duration of the simulation
+        (default is 100).
+
+    """
+    def __init__(self, tol=1e-4, n_checks=100):
+        self.tol = tol
+        self.n_checks = n_checks
+        self.reset()
+
+    def reset(self):
+        self.period = None
+        self.nite = 0
+        self.previous = None
+        self.previous_t = None
+        self.fluid_index = None
+        self.residual = np.nan
+        self.history = []
+        self.steady = False
+        self.steady_time = None
+
+    def __call__(self, duration, sol):
+        """
+        Update the residual if sol is at a checkpoint and return
+        True if the steady state is reached.
+        """
+        if self.period is None:
+            self.period = max(1, int(duration/sol.dt/self.n_checks))
+
+        self.nite += 1
+        if self.steady or self.nite < self.period:
+            return self.steady
+        self.nite = 0
+
+        if self.fluid_index is None:
+            vmax = sol.domain.stencil.vmax
+            ind = tuple(slice(vm, -vm) for vm in vmax)
+            self.fluid_index = (sol.domain.in_or_out == sol.domain.valin)[ind]
+
+        current = [sol.m[k][self.fluid_index] for k in sol.scheme.consm.keys()]
+        if self.previous is not None and sol.t > self.previous_t:
+            residual = 0.
+            for cur, prev in zip(current, self.previous):
+                norm = np.linalg.norm(cur)
+                diff = np.linalg.norm(cur - prev)
+                residual = max(residual, diff/norm if norm > 0 else diff)
+            self.residual = residual/(sol.t - self.previous_t)
+            self.history.append((sol.t, self.residual))
+            if self.residual < self.tol:
+                self.steady = True
+                self.steady_time = sol.t
+
+        self.previous = current
+        self.previous_t = sol.t
+        return self.steady
+
+class SteadyState(DuringSimulation):
+    """
+    Time to reach the steady state.
+
+    The simulation is stopped as soon as the steady state is reached
+    (see ResidualMonitor). The value is nan if it is never reached.
+    """
+    def __init__(self, tol=1e-4, n_checks=100):
+        self.monitor = ResidualMonitor(tol, n_checks)
+
+    @property
+    def tol(self):
+        return self.monitor.tol
+
+    @tol.setter
+    def tol(self, value):
+        self.monitor.tol = value
+
+    def __call__(self, duration, sol):
+        return not self.monitor(duration, sol)
+
+    def value(self):
+        if self.monitor.steady_time is None:
+            return np.nan
+        return self.monitor.steady_time
+
+    def __str__(self):
+        return 'SteadyTime'
+
 class CFL(AfterSimulation):
     def __init__(self, rho, q):
         self.rho = rho
@@ -297,7 +431,10 @@ class Plot(AfterSimulation):
         fig, ax = plt.subplots()
         h5_file, _ = os.path.splitext(self.filename)
         h5_dir, h5_file = os.path.split(h5_file)
+        h5_filename = os.path.join(h5_dir, f'{h5_file}_{sol.nt}.h5')
+        release(h5_filename)
         h5 = pylbm.H5File(sol.domain.mpi_topo, f'{h5_file}_{sol.nt}', h5_dir)
+        bounds = {'sol': compute_bounds(data)}
 
         if sol.dim == 1:
             x = sol.domain.x
@@ -317,6 +454,7 @@ class Plot(AfterSimulation):
                     linewidth=1,
                     )
                 h5.add_scalar('sol_ref', self.ref_solution)
+                bounds['sol_ref'] = compute_bounds(self.ref_solution)
 
         elif sol.dim == 2:
             x, y = sol.domain.x, sol.domain.y
@@ -330,3 +468,5 @@ class Plot(AfterSimulation):
         h5.add_scalar('sol', data)
         fig.savefig(self.filename, dpi=300)
         h5.save()
+        write_metadata(h5_filename, bounds)
+        register_h5(h5_filename)
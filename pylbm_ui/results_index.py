@@ -0,0 +1,378 @@
+# Authors:
+#     Loic Gouarin <loic.gouarin@polytechnique.edu>
+#     Benjamin Graille <benjamin.graille@universite-paris-saclay.fr>
+#     Thibaut Van Hoof <thibaut.vanhoof@cenaero.be>
+#
+# License: BSD 3 clause
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+from contextlib import closing
+
+import h5py
+
+from .config import default_path
+
+index_filename = 'results_index.db'
+# incremented when the tables change: an older index is rebuilt
+index_version = 1
+result_files = ['simu_config.json', 'parametric_study.json']
+grid_names = ['x_0', 'x_1', 'x_2']
+
+
+def read_h5_fields(filename, attempts=20, delay=0.05):
+    """
+    Return the list of the fields stored in a hdf5 file.
+
+    The file can be temporarily unavailable if it is written by a
+    simulation. In this case, we retry a few times and return None
+    if the file is still not available.
+    """
+    for _ in range(attempts):
+        try:
+            with h5py.File(filename, 'r') as h5_data:
+                return [k for k in h5_data.keys() if k not in grid_names]
+        except OSError:
+            time.sleep(delay)
+    return None
+
+
+def get_iteration(filename):
+    """
+    Return the iteration number found in the name of a hdf5 file
+    (field_iteration.h5) or None if the name doesn't match.
+    """
+    tmp = os.path.splitext(os.path.basename(filename))[0].split('_')
+    if len(tmp) == 2:
+        try:
+            return int(tmp[-1])
+        except ValueError:
+            return None
+    return None
+
+
+def build_items(cfg, filename, fields):
+    """
+    Build the rows of the post treatment table for the fields
+    stored in the hdf5 file filename.
+    """
+    ite = get_iteration(filename)
+    dx = cfg['dx']
+    la = cfg['lb_scheme']['args']['la']
+    dt = dx/la
+
+    items = []
+    for k in fields:
+        item = {
+            'iteration': ite,
+            'dim': cfg['dim'],
+            'time': ite*dt,
+            'field': k,
+            'model': cfg['v_model']['model'],
+            'test case': cfg['v_model']['test_case'],
+            'lb scheme': cfg['v_model']['lb_scheme'],
+            'file': os.path.basename(filename),
+            'directory': os.path.dirname(os.path.abspath(filename)),
+        }
+        dhash = hashlib.md5()
+        encoded = json.dumps(item, sort_keys=True).encode()
+        dhash.update(encoded)
+        item['id'] = dhash.hexdigest()
+        items.append(item)
+    return items
+
+
+class ResultIndex:
+    """
+    Persistent index of the fields saved in the hdf5 files found
+    in the output directory.
+
+    The index is a SQLite database stored at the root of the output
+    directory. It is updated incrementally: the content of a directory
+    is only listed again if its modification time has changed and a
+    hdf5 file is only opened again if its modification time or its
+    size has changed.
+
+    Parameters
+    ==========
+
+    - path: str
+        the root of the output directory (default is default_path).
+
+    """
+    columns = [
+        'id', 'iteration', 'dim', 'time', 'field', 'model',
+        'test case', 'lb scheme', 'file', 'directory'
+    ]
+
+    def __init__(self, path=default_path):
+        self.path = os.path.abspath(path)
+        self.db = os.path.join(self.path, index_filename)
+
+    def connect(self):
+        conn = sqlite3.connect(self.db, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        if conn.execute('PRAGMA user_version').fetchone()[0] != index_version:
+            conn.executescript(f'''
+                DROP TABLE IF EXISTS directories;
+                DROP TABLE IF EXISTS files;
+                DROP TABLE IF EXISTS items;
+                PRAGMA user_version = {index_version};
+            ''')
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS directories (
+                path TEXT PRIMARY KEY,
+                parent TEXT,
+                mtime REAL,
+                config_mtime REAL,
+                result INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                directory TEXT,
+                mtime REAL,
+                size INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS items (
+                path TEXT,
+                id TEXT,
+                iteration INTEGER,
+                dim INTEGER,
+                time REAL,
+                field TEXT,
+                model TEXT,
+                test_case TEXT,
+                lb_scheme TEXT,
+                file TEXT,
+                directory TEXT
+            );
+            CREATE INDEX IF NOT EXISTS items_dim ON items (dim);
+            CREATE INDEX IF NOT EXISTS items_path ON items (path);
+            CREATE INDEX IF NOT EXISTS files_directory ON files (directory);
+            CREATE INDEX IF NOT EXISTS directories_parent ON directories (parent);
+        ''')
+        return conn
+
+    def contains(self, filename):
+        """Check if filename is inside the indexed directory."""
+        filename = os.path.abspath(filename)
+        try:
+            return os.path.commonpath([self.path, filename]) == self.path
+        except ValueError:
+            return False
+
+    def update(self):
+        """
+        Update the index with the hdf5 files created or removed
+        since the last update.
+        """
+        if not os.path.isdir(self.path):
+            return
+
+        with closing(self.connect()) as conn, conn:
+            known = {
+                path: (parent, mtime, config_mtime)
+                for path, parent, mtime, config_mtime in conn.execute(
+                    'SELECT path, parent, mtime, config_mtime FROM directories'
+                )
+            }
+            children = {}
+            for path, (parent, _, _) in known.items():
+                children.setdefault(parent, []).append(path)
+
+            visited = set()
+            to_visit = [(self.path, None)]
+            while to_visit:
+                path, parent = to_visit.pop()
+                try:
+                    mtime = os.stat(path).st_mtime
+                except OSError:
+                    continue
+                config_mtime = self._config_mtime(path)
+                visited.add(path)
+
+                if path in known and known[path][1:] == (mtime, config_mtime):
+                    # nothing has been added or removed in this directory
+                    to_visit.extend((c, path) for c in children.get(path, []))
+                    continue
+
+                subdirs, complete, result = self._update_directory(conn, path)
+                to_visit.extend((s, path) for s in subdirs)
+
+                # if a file was not available, force a new scan next time
+                conn.execute(
+                    'INSERT OR REPLACE INTO directories VALUES (?, ?, ?, ?, ?)',
+                    (path, parent, mtime if complete else -1, config_mtime, result)
+                )
+
+            for path in set(known) - visited:
+                self._remove_directory(conn, path)
+
+    def items(self, dim=None):
+        """
+        Return the rows of the post treatment table.
+
+        Parameters
+        ==========
+
+        - dim: int
+            if given, only the results of this dimension are returned.
+
+        """
+        if not os.path.exists(self.db):
+            return []
+
+        query = '''SELECT id, iteration, dim, time, field, model,
+                          test_case, lb_scheme, file, directory
+                   FROM items'''
+        args = ()
+        if dim is not None:
+            query += ' WHERE dim = ?'
+            args = (dim,)
+        query += ' ORDER BY directory, file, field'
+
+        with closing(self.connect()) as conn, conn:
+            return [dict(zip(self.columns, row)) for row in conn.execute(query, args)]
+
+    def result_directories(self):
+        """
+        Return the directories of the simulations and of the parametric
+        studies relative to the root of the index, as found by the last
+        update.
+        """
+        if not os.path.exists(self.db):
+            return []
+
+        with closing(self.connect()) as conn, conn:
+            paths = [
+                path for path, in conn.execute('SELECT path FROM directories WHERE result = 1')
+            ]
+        return sorted(os.path.relpath(p, self.path) for p in paths)
+
+    def register(self, filename):
+        """
+        Add or update a hdf5 file in the index.
+
+        This method is called by the writers when a new file is created
+        so that the next update doesn't have to open it again.
+        """
+        filename = os.path.abspath(filename)
+        if not os.path.isdir(self.path) or not self.contains(filename):
+            return
+
+        cfg = self._load_config(os.path.dirname(filename))
+        if cfg is None:
+            return
+
+        with closing(self.connect()) as conn, conn:
+            self._index_file(conn, filename, cfg)
+
+    def _config_mtime(self, path):
+        try:
+            return os.stat(os.path.join(path, 'simu_config.json')).st_mtime
+        except OSError:
+            return None
+
+    def _load_config(self, path):
+        try:
+            with open(os.path.join(path, 'simu_config.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _update_directory(self, conn, path):
+        """
+        List the directory path and index the new or modified hdf5 files.
+
+        Return the subdirectories, a boolean which is False if a hdf5
+        file could not be read and a boolean which is True if the
+        directory is the output of a simulation or of a parametric study.
+        """
+        subdirs, h5files = [], []
+        result = False
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir():
+                    subdirs.append(entry.path)
+                elif entry.name.endswith('.h5'):
+                    h5files.append(entry.path)
+                elif entry.name in result_files:
+                    result = True
+
+        known = {
+            f: (mtime, size)
+            for f, mtime, size in conn.execute(
+                'SELECT path, mtime, size FROM files WHERE directory = ?', (path,)
+            )
+        }
+
+        cfg = self._load_config(path)
+        if cfg is None:
+            h5files = []
+
+        complete = True
+        for h5 in h5files:
+            if get_iteration(h5) is None:
+                continue
+            st = os.stat(h5)
+            if known.get(h5) == (st.st_mtime, st.st_size):
+                continue
+            complete &= self._index_file(conn, h5, cfg)
+
+        for h5 in set(known) - set(h5files):
+            self._remove_file(conn, h5)
+
+        return subdirs, complete, result
+
+    def _index_file(self, conn, filename, cfg):
+        if get_iteration(filename) is None:
+            return True
+
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return True
+
+        fields = read_h5_fields(filename)
+        if fields is None:
+            return False
+
+        self._remove_file(conn, filename)
+        conn.execute(
+            'INSERT INTO files VALUES (?, ?, ?, ?)',
+            (filename, os.path.dirname(filename), st.st_mtime, st.st_size)
+        )
+        conn.executemany(
+            'INSERT INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [
+                (filename,) + tuple(item[k] for k in self.columns)
+                for item in build_items(cfg, filename, fields)
+            ]
+        )
+        return True
+
+    def _remove_file(self, conn, filename):
+        conn.execute('DELETE FROM files WHERE path = ?', (filename,))
+        conn.execute('DELETE FROM items WHERE path = ?', (filename,))
+
+    def _remove_directory(self, conn, path):
+        conn.execute('DELETE FROM directories WHERE path = ?', (path,))
+        conn.execute('DELETE FROM files WHERE directory = ?', (path,))
+        conn.execute('DELETE FROM items WHERE directory = ?', (path,))
+
+
+def register_h5(filename, path=default_path):
+    """
+    Register a new hdf5 file in the result index of the output directory.
+
+    The index is only a cache: if it can't be updated now (locked database,
+    file outside of the output directory, ...), the file will be found
+    during the next update.
+    """
+    try:
+        ResultIndex(path).register(filename)
+    except sqlite3.Error:
+        pass
@@ -16,6 +16,10 @@ import copy
 from mpl_toolkits.axes_grid1 import make_axes_locatable
 import pylbm
 
+from .results_index import register_h5
+from .h5_cache import compute_bounds, write_metadata, release
+from .checkpoint import Checkpoint, checkpoint_key, checkpoint_filename
+
 class Plot:
     def __init__(self):
         plt.ioff()
@@ -175,6 +179,7 @@ class simulation:
         self.path = None
         self.dx = None
         self.simu_cfg = None
+        self.checkpoint = None
 
     def reset_path(self, path):
         if not os.path.exists(path):
@@ -210,6 +215,23 @@ class simulation:
         self.sol = pylbm.Simulation(
             self.simu_cfg, initialize=initialize
         )
+        if self.path:
+            self.checkpoint = Checkpoint(
+                os.path.join(self.path, checkpoint_filename),
+                checkpoint_key(test_case, lb_scheme, dx, codegen=codegen)
+            )
+
+    def resume(self):
+        """
+        Restore the checkpoint of the simulation path.
+
+        Return False if there is no checkpoint. A ValueError is raised
+        if the checkpoint has been written with another configuration.
+        """
+        if self.checkpoint is None or not self.checkpoint.exists():
+            return False
+        self.checkpoint.load(self.sol)
+        return True
 
     @property
     def duration(self):
@@ -241,7 +263,10 @@ class simulation:
         else:
             filename = f'{field}'
 
+        h5_filename = os.path.join(self.path, f'{filename}_{self.sol.nt}.h5')
+        release(h5_filename)
         h5 = pylbm.H5File(self.sol.domain.mpi_topo, filename, self.path, self.sol.nt)
+        bounds = {}
 
         if self.sol.dim == 1:
             h5.set_grid(self.sol.domain.x)
@@ -251,6 +276,7 @@ class simulation:
         def save_one_field(f):
             data = self.get_data(f)
             h5.add_scalar(f, data)
+            bounds[f] = compute_bounds(data)
             if has_ref:
                 if self.sol.dim == 1:
                     data_ref = self.test_case.ref_solution(self.sol.t, self.sol.domain.x, f)
@@ -259,6 +285,7 @@ class simulation:
                 else:
                     data_ref = self.test_case.ref_solution(self.sol.t, self.sol.domain.x, self.sol.domain.y, self.sol.domain.z, f)
                 h5.add_scalar(f'{f}_ref', data_ref)
+                bounds[f'{f}_ref'] = compute_bounds(data_ref)
 
         if isinstance(field, set):
             for f in field:
@@ -267,6 +294,8 @@ class simulation:
             save_one_field(field)
 
         h5.save()
+        write_metadata(h5_filename, bounds)
+        register_h5(h5_filename)
 
     def plot(self, fig, field, properties=None):
         data = self.get_data(field)
@@ -280,6 +309,8 @@ class simulation:
         save_simu_config(self.path, filename, self.dx, self.v_model, self.test_case, self.lb_scheme)
 
     def save_stats(self, stats, filename='simu_config.json'):
-        from .json import save_stats
+        from .json import save_stats, compact_journal
         if self.path:
             save_stats(self.path, filename, stats)
+            # the run is finished: merge its journal in its json files
+            compact_journal(self.path)
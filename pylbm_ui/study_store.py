@@ -0,0 +1,168 @@
+# Authors:
+#     Loic Gouarin <loic.gouarin@polytechnique.edu>
+#     Benjamin Graille <benjamin.graille@universite-paris-saclay.fr>
+#     Thibaut Van Hoof <thibaut.vanhoof@cenaero.be>
+#
+# License: BSD 3 clause
+
+import os
+
+import h5py
+import numpy as np
+
+from .h5_cache import release
+
+store_filename = 'parametric_study.h5'
+
+
+class StudyStore:
+    """
+    Columnar storage of the sampling and of the results of a parametric
+    study.
+
+    The store is a hdf5 file next to parametric_study.json which only
+    keeps the description of the study. The results are stored with one
+    resizable dataset by column (design variables and responses) and one
+    row by sample so that they can be appended while the study runs.
+
+    Parameters
+    ==========
+
+    - path: str
+        the directory of the parametric study.
+
+    - filename: str
+        the name of the hdf5 file (default is store_filename).
+
+    """
+    def __init__(self, path, filename=store_filename):
+        self.path = path
+        self.filename = os.path.join(path, filename)
+
+    def exists(self):
+        return os.path.exists(self.filename)
+
+    def manifest(self):
+        """Return the entry describing the store in the json file."""
+        return {'file': os.path.basename(self.filename)}
+
+    def save_sampling(self, names, sampling):
+        """
+        Create a new store with the sampling of the design space.
+
+        Parameters
+        ==========
+
+        - names: list
+            the names of the design variables.
+
+        - sampling: numpy array
+            the samples with one row by sample and one column
+            by design variable.
+
+        """
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+        release(self.filename)
+        with h5py.File(self.filename, 'w') as h5_data:
+            dset = h5_data.create_dataset(
+                'sampling', data=np.asarray(sampling, dtype=np.float64)
+            )
+            dset.attrs['names'] = [str(n) for n in names]
+
+    def load_sampling(self):
+        """Return the names of the design variables and the sampling."""
+        with h5py.File(self.filename, 'r') as h5_data:
+            dset = h5_data['sampling']
+            return list(dset.attrs['names']), dset[...]
+
+    def create_results(self, labels):
+        """
+        Create the columns of the results.
+
+        Parameters
+        ==========
+
+        - labels: list
+            the label of each column.
+
+        """
+        with h5py.File(self.filename, 'a') as h5_data:
+            if 'results' in h5_data:
+                del h5_data['results']
+            group = h5_data.create_group('results')
+            group.attrs['labels'] = [str(l) for l in labels]
+            for i in range(len(labels)):
+                group.create_dataset(
+                    f'col_{i}', shape=(0,), maxshape=(None,),
+                    dtype=np.float64, chunks=(1024,)
+                )
+
+    def append_results(self, rows):
+        """
+        Append rows at the end of the results.
+
+        Parameters
+        ==========
+
+        - rows: list
+            each row is a list with one value by column. None values
+            are stored as nan.
+
+        """
+        if not rows:
+            return
+        values = np.asarray(
+            [[np.nan if r is None else r for r in row] for row in rows],
+            dtype=np.float64
+        )
+        with h5py.File(self.filename, 'a') as h5_data:
+            group = h5_data['results']
+            for i in range(values.shape[1]):
+                dset = group[f'col_{i}']
+                n = dset.shape[0]
+                dset.resize((n + values.shape[0],))
+                dset[n:] = values[:, i]
+
+    def save_results(self, results):
+        """
+        Replace the results by the columns given as a list of
+        dict(values=, label=).
+        """
+        self.create_results([r['label'] for r in results])
+        self.append_results(np.column_stack([r['values'] for r in results]).tolist())
+
+    def load_results(self):
+        """
+        Return the results as a list of dict(values=, label=) with
+        one item by column.
+        """
+        with h5py.File(self.filename, 'r') as h5_data:
+            if 'results' not in h5_data:
+                return []
+            group = h5_data['results']
+            return [
+                dict(values=group[f'col_{i}'][...], label=label)
+                for i, label in enumerate(group.attrs['labels'])
+            ]
+
+
+def load_results(path, json_data):
+    """
+    Return the results of a parametric study described by json_data
+    (the content of parametric_study.json).
+
+    The results of the studies saved before the columnar store are read
+    from the json file.
+    """
+    if 'results' in json_data:
+        return [
+            dict(values=np.asarray(r['values']), label=r['label'])
+            for r in json_data['results']
+        ]
+    if 'store' in json_data:
+        store = StudyStore(path, json_data['store']['file'])
+        if store.exists():
+            return store.load_results()
+    return []
@@ -13,6 +13,45 @@ from .widgets import *
 
 from schema import cases
 
+
+class LazyWidget:
+    """
+    Tab widget built the first time it is displayed.
+
+    The widgets of the tabs create figures, walk the output directory
+    and observe the other widgets when they are built: this is done
+    only if the user opens the tab.
+
+    Parameters
+    ==========
+
+    - factory: callable
+        return the widget when called without argument.
+
+    """
+    def __init__(self, factory):
+        self.factory = factory
+        self._widget = None
+
+    @property
+    def built(self):
+        return self._widget is not None
+
+    @property
+    def widget(self):
+        if self._widget is None:
+            self._widget = self.factory()
+        return self._widget
+
+    @property
+    def menu(self):
+        return self.widget.menu
+
+    @property
+    def main(self):
+        return self.widget.main
+
+
 @debug_func
 def get_information(tab_id, mc, tc, lb):
     if tab_id == 0:
@@ -61,10 +100,14 @@ def main():
     tc = TestCaseWidget(mc)
     lb = LBSchemeWidget(tc)
 
-    stability =  StabilityWidget(tc, lb)
-    simulation = SimulationWidget(tc, lb)
-    parametric = ParametricStudyWidget(tc, lb, simulation.discret, simulation.codegen)
-    posttreatment = PostTreatmentWidget()
+    stability = LazyWidget(lambda: StabilityWidget(tc, lb))
+    simulation = LazyWidget(lambda: SimulationWidget(tc, lb))
+    parametric = LazyWidget(
+        lambda: ParametricStudyWidget(
+            tc, lb, simulation.widget.discret, simulation.widget.codegen
+        )
+    )
+    posttreatment = LazyWidget(PostTreatmentWidget)
 
     class DebugWidget:
         def __init__(self):
@@ -111,6 +154,9 @@ def main():
             items.extend(get_information(tab_id, mc, tc, lb))
 
         widget = tab_widgets[tab_id]
+        # the simulation and parametric widgets read the output directory
+        # when they are built: the post treatment widget doesn't
+        refresh = getattr(widget, 'built', True)
         items.extend([
             v.ListItem(
                 children=[
@@ -122,14 +168,14 @@ def main():
         menu.children = items
         content.children = widget.main
 
-        if tab_id == 4:
-            simulation.update_simu_cfg_list()
+        if refresh and tab_id == 4:
+            simulation.widget.update_simu_cfg_list()
 
-        if tab_id == 5:
-            parametric.update_param_cfg_list()
+        if refresh and tab_id == 5:
+            parametric.widget.update_param_cfg_list()
 
         if tab_id == 6:
-            posttreatment.update(None)
+            posttreatment.widget.update(None)
 
     tab_change(None)
     tab.observe(tab_change, 'v_model')
@@ -16,8 +16,9 @@ import tempfile
 import shutil
 import asyncio
 import pathos
-import pathos.pools as pp
+from pathos.helpers import cpu_count
 import json
+import sys
 import time
 
 from .debug import debug, debug_func
@@ -26,16 +27,58 @@ from .dialog_path import DialogPath
 from .discretization import dx_validity
 from .responses import ResponsesWidget
 from ..config import default_path
-from ..responses import FromConfig, DuringSimulation, AfterSimulation
+from schema.utils import ExactSolutionCache
+from ..responses import FromConfig, DuringSimulation, AfterSimulation, Plot
 from ..simulation import simulation, get_config
-from ..utils import required_fields, NbPointsField
-from ..json import save_param_study, save_simu_config, save_param_study_for_simu, save_stats, save_results, save_param_study_Minamo
+from ..utils import required_fields, NbPointsField, StrictlyPositiveFloatField, StrictlyPositiveIntField
+from ..convergence import convergence_dx, convergence_report
+from ..json import save_param_study, save_simu_config, save_param_study_for_simu, save_stats, save_results, save_param_study_Minamo, compact_journal, append_journal
+from ..study_store import StudyStore, load_results
+from ..checkpoint import Checkpoint, checkpoint_key, checkpoint_filename
+from ..workers import WorkerConfig, pinning_methods
+from ..executors import backends, default_command, default_address, LocalPoolExecutor, CommandExecutor, TCPQueueExecutor, JobDaemonExecutor
 from .message import Message
 
+# states of the branching studies kept in memory: the workers forked
+# after their computation share them copy-on-write
+_branch_states = {}
+
+def get_branch_state(branch):
+    """
+    Return the shared state of a branching study, read from its
+    checkpoint if it is not in memory.
+    """
+    state = _branch_states.get(branch.filename)
+    if state is None:
+        state = branch.read()
+        _branch_states[branch.filename] = state
+    return state
+
+def run_prefix(simu_cfg, reference, branch_time, branch):
+    """
+    Run the transient shared by the samples of a branching study with
+    the reference values of the design parameters and save its final
+    state in the checkpoint branch.
+    """
+    simu_cfg = dict(simu_cfg)
+    simu_cfg['codegen_option'] = dict(simu_cfg['codegen_option'], generate=False)
+    sol = pylbm.Simulation(simu_cfg, initialize=False)
+    sol.extra_parameters = reference
+    sol._need_init = True
+
+    stop_time = branch_time - .5*sol.dt
+    while sol.t < stop_time:
+        sol.one_time_step()
+
+    branch.save(sol)
+    state = branch.read()
+    _branch_states[branch.filename] = state
+    return state
+
 @debug_func
 def run_simulation(args):
     stats = {}
-    simu_cfg, sample, duration, responses = args
+    simu_cfg, sample, duration, responses, branch = args
     simu_cfg['codegen_option']['generate'] = False
 
     output = [0]*len(responses)
@@ -47,6 +90,12 @@ def run_simulation(args):
     sol.extra_parameters = sample
 
     sol._need_init = True
+    if branch is not None:
+        # start from the end of the shared transient
+        branch.restore(sol, get_branch_state(branch))
+        stats['branch nt'] = float(sol.nt)
+    # the statistics only count the iterations run by this sample
+    nt0 = sol.nt
     solid_cells = sol.domain.in_or_out != sol.domain.valin
 
     stats['responses'] = 0
@@ -73,9 +122,9 @@ def run_simulation(args):
     nite = 0
     niteStab =  int(duration/sol.dt/10) # the number of stability check during the simulation = 10
     can_continue = True
-    # while sol.t <= duration and not can_continue:
     stats['LBM'] = 0
-    while sol.t <= duration and not unstable:
+    # the responses can stop the simulation before the end (see SteadyState)
+    while sol.t <= duration and not unstable and can_continue:
         t1 = time.time()
         sol.one_time_step()
         t2 = time.time()
@@ -105,11 +154,44 @@ def run_simulation(args):
     t2 = time.time()
 
     stats['responses'] += t2 - t1
-    stats['nt'] = float(sol.nt)
+    stats['nt'] = float(sol.nt - nt0)
     stats['domain_size'] = float(np.prod(sol.domain.shape_in))
-    stats['MLUPS'] = sol.nt*np.prod(sol.domain.shape_in)/stats['LBM']/1e6
+    stats['MLUPS'] = (sol.nt - nt0)*np.prod(sol.domain.shape_in)/stats['LBM']/1e6
     return [not unstable] + output, stats
 
+def run_sample(isamp, args, worker=None):
+    """
+    Run the simulation of the sample isamp: the results come back in
+    the order of completion and not in the order of the sampling.
+
+    The process is first configured by worker (see WorkerConfig).
+    """
+    if worker is not None:
+        worker.apply()
+    return isamp, run_simulation(args)
+
+def prepare_exact_solutions(cases, directory):
+    """
+    Compute the exact solutions of the test cases of the samples at once
+    and store them in directory if the module of the test case provides
+    prepare_exact_solutions (see schema/Dimension1/Euler/toro.py).
+    """
+    if not cases:
+        return
+    module = sys.modules.get(type(cases[0]).__module__)
+    prepare = getattr(module, 'prepare_exact_solutions', None)
+    if prepare is not None:
+        prepare(cases, directory)
+
+def sample_cost(dx, size, dt, duration):
+    """
+    Return the number of lattice updates predicted for a simulation:
+    the number of points of the grid given by dx_validity times the
+    number of time steps.
+    """
+    _, _, n = dx_validity(dx, size)
+    return float(np.prod(n))*(np.floor(duration/dt + .5) + 1)
+
 skopt_method = {'Latin hypercube': Lhs,
                 'Sobol': Sobol,
                 'Halton': Halton,
@@ -160,6 +242,44 @@ class ParametricStudyWidget:
         self.sampling_method = v.Select(label='Method', items=list(skopt_method.keys()), v_model=list(skopt_method.keys())[0])
         self.sample_size = NbPointsField(label='Number of samples', v_model=10)
 
+        self.branching = v.Switch(label='Branch from a shared transient', v_model=False)
+        self.branch_time = StrictlyPositiveFloatField(
+            label='Branching time (fraction of the duration)', v_model=0.5,
+            hint='only the relaxation parameters can be studied with branching'
+        )
+
+        self.convergence = v.Switch(label='Grid convergence study', v_model=False)
+        self.refinement_ratio = StrictlyPositiveFloatField(
+            label='Refinement ratio', v_model=2,
+            hint='the simulations use dx, dx*ratio, dx*ratio**2, ...'
+        )
+        self.n_levels = NbPointsField(label='Number of grids', v_model=4)
+
+        self.n_workers = StrictlyPositiveIntField(
+            label='Number of workers', v_model=max(1, cpu_count()//2)
+        )
+        self.n_threads = StrictlyPositiveIntField(
+            label='Threads by worker', v_model=1,
+            hint='OpenMP and BLAS threads of each worker'
+        )
+        self.pinning = v.Select(label='Pin the workers to', items=pinning_methods, v_model='none')
+        self.workers_info = v.Html(tag='div', class_='caption', children=[])
+        self.update_workers_info(None)
+
+        self.backend = v.Select(label='Execution backend', items=backends, v_model=backends[0])
+        self.submit_command = v.TextField(
+            label='Submit command', v_model=default_command,
+            hint='{command} is the command of a sample, e.g. sbatch --wrap "{command}"'
+        )
+        self.queue_address = v.TextField(
+            label='Work queue address', v_model=f'{default_address[0]}:{default_address[1]}',
+            hint='use the name of this machine instead of localhost to accept remote workers'
+        )
+        self.queue_authkey = v.TextField(
+            label='Work queue key', v_model='',
+            hint='a random key is generated if empty'
+        )
+
         self.run = v.Btn(v_model=True, children=['Run parametric study'], class_="ma-5", color='success')
 
         self.menu = [
@@ -172,12 +292,27 @@ class ParametricStudyWidget:
                 ]),
                 v.ExpansionPanel(children=[
                     v.ExpansionPanelHeader(children=['Responses']),
-                    v.ExpansionPanelContent(children=[self.responses.widget]),
+                    v.ExpansionPanelContent(children=[self.responses.widget, self.responses.steady_tol]),
                 ]),
                 v.ExpansionPanel(children=[
                     v.ExpansionPanelHeader(children=['Sampling method']),
                     v.ExpansionPanelContent(children=[self.sampling_method, self.sample_size]),
                 ]),
+                v.ExpansionPanel(children=[
+                    v.ExpansionPanelHeader(children=['Branching']),
+                    v.ExpansionPanelContent(children=[self.branching, self.branch_time]),
+                ]),
+                v.ExpansionPanel(children=[
+                    v.ExpansionPanelHeader(children=['Convergence study']),
+                    v.ExpansionPanelContent(children=[self.convergence, self.refinement_ratio, self.n_levels]),
+                ]),
+                v.ExpansionPanel(children=[
+                    v.ExpansionPanelHeader(children=['Workers']),
+                    v.ExpansionPanelContent(children=[
+                        self.n_workers, self.n_threads, self.pinning, self.workers_info,
+                        self.backend, self.submit_command, self.queue_address, self.queue_authkey
+                    ]),
+                ]),
             ], multiple=True),
         ]
 
@@ -190,6 +325,7 @@ class ParametricStudyWidget:
         self.fig = v.Row(children=[],
                          align='center', justify='center')
         self.plotly_plot = v.Container(align_content_center=True)
+        self.convergence_plot = v.Row(children=[], align='center', justify='center')
 
         self.dialog = DialogPath()
 
@@ -206,6 +342,8 @@ class ParametricStudyWidget:
         self.test_case_widget.select_case.observe(self.purge, 'v_model')
         self.lb_scheme_widget.select_case.observe(self.purge, 'v_model')
         self.param_cfg.observe(self.load_param_cfg, 'v_model')
+        self.n_workers.observe(self.update_workers_info, 'v_model')
+        self.n_threads.observe(self.update_workers_info, 'v_model')
 
         self.color.observe(self.change_plot, 'v_model')
         self.items.observe(self.change_plot, 'v_model')
@@ -219,6 +357,62 @@ class ParametricStudyWidget:
         param_list.sort()
         self.param_cfg.items = param_list
 
+    def get_worker_config(self):
+        n_workers = max(1, cpu_count()//2) if self.n_workers.error else self.n_workers.value
+        n_threads = 1 if self.n_threads.error else self.n_threads.value
+        return WorkerConfig(n_workers, n_threads, self.pinning.v_model)
+
+    def get_executor(self, path):
+        """
+        Return the executor of the simulations of the study saved in path.
+        """
+        worker = self.get_worker_config()
+        if self.backend.v_model == 'command':
+            return CommandExecutor(
+                os.path.join(path, 'tasks'), self.submit_command.v_model,
+                max_jobs=worker.n_workers
+            )
+        if self.backend.v_model == 'TCP queue':
+            host, port = self.queue_address.v_model.rsplit(':', 1)
+            # the local workers run the study even if no other machine
+            # joins the queue
+            executor = TCPQueueExecutor(
+                (host, int(port)), self.queue_authkey.v_model or None,
+                local_workers=worker.n_workers
+            )
+            # the workers need the generated key
+            self.queue_authkey.v_model = executor.authkey
+            return executor
+        if self.backend.v_model == 'job daemon':
+            return JobDaemonExecutor(max_jobs=worker.n_workers)
+        return LocalPoolExecutor(worker.n_workers)
+
+    def update_workers_info(self, change):
+        worker = self.get_worker_config()
+        n_cpus = cpu_count()
+        info = f'{worker.n_workers} workers x {worker.n_threads} threads = {worker.n_workers*worker.n_threads} threads for {n_cpus} cpus'
+        if worker.n_workers*worker.n_threads > n_cpus:
+            info += ': the cores are oversubscribed'
+        self.workers_info.children = [info]
+
+    def is_convergence_study(self):
+        return (
+            self.convergence.v_model
+            and not self.refinement_ratio.error and self.refinement_ratio.value > 1
+            and not self.n_levels.error
+        )
+
+    def get_design_space(self):
+        """
+        Return the design space of the study: the space steps of the
+        grids for a convergence study, the design space of the menu
+        otherwise.
+        """
+        if self.is_convergence_study():
+            dx = convergence_dx(self.discret_widget['dx'].value, self.refinement_ratio.value, self.n_levels.value)
+            return {'dx': (dx[0], dx[-1])}
+        return self.design.design_space()
+
     def start_PS(self, widget, event, data):
         if self.run.v_model:
             path = os.path.join(default_path, self.study_name.v_model)
@@ -252,7 +446,8 @@ class ParametricStudyWidget:
         sample_path = os.path.join(path, 'pts')
         if not os.path.exists(sample_path): os.makedirs(sample_path)
         
-        design_space = self.design.design_space()
+        convergence = self.is_convergence_study()
+        design_space = self.get_design_space()
         if design_space:
             self.run.v_model = False
             self.run.children = ['Stop parametric study']
@@ -269,20 +464,33 @@ class ParametricStudyWidget:
 
             message = Message('Initialize')
             self.plotly_plot.children = [message]
-            sampling = np.asarray(skopt_method[self.sampling_method.v_model]().generate(list(design_space.values()), int(self.sample_size.v_model)))
+            if convergence:
+                # from the finest to the coarsest grid: the longest
+                # simulations are started first
+                sampling = np.asarray(convergence_dx(dx, self.refinement_ratio.value, self.n_levels.value))[:, np.newaxis]
+            else:
+                sampling = np.asarray(skopt_method[self.sampling_method.v_model]().generate(list(design_space.values()), int(self.sample_size.v_model)))
+
+            # the files shared with the workers must be visible by
+            # all the machines for the remote executors
+            executor = self.get_executor(path)
+            work_dir = self.tmp_dir.name if executor.local else os.path.join(path, 'work')
 
             save_param_study(path, 'parametric_study.json', self.discret_widget['dx'].value, v_model, test_case, lb_scheme, self, sampling)
             save_param_study_Minamo(path, 'parametric_study.json', 'master.json', self.responses)
             
-            message.update(f'Prepare the simulation in {self.tmp_dir.name}')
+            message.update(f'Prepare the simulation in {work_dir}')
             simu = simulation()
-            simu.reset_sol(v_model, test_case, lb_scheme, dx, self.codegen.v_model, exclude=design_space.keys(), initialize=False, codegen_dir=self.tmp_dir.name, show_code=False)
+            simu.reset_sol(v_model, test_case, lb_scheme, dx, self.codegen.v_model, exclude=design_space.keys(), initialize=False, codegen_dir=work_dir, show_code=False)
 
             args = []
-            tmp_case = test_case.copy()
+            design_samples = []
+            sample_cases = []
+            costs = []
             for i, s in enumerate(sampling):
                 design_sample = {}
-                self.design.transform_design_space(s)
+                if not convergence:
+                    self.design.transform_design_space(s)
 
                 for ik, k in enumerate(design_space.keys()):
                     if k in test_case.__dict__:
@@ -309,54 +517,154 @@ class ParametricStudyWidget:
                 if 'duration' in design_sample:
                     duration = design_sample['duration']
 
+                # the test case of the sample with its design parameters
+                tmp_case = test_case.copy()
                 tmp_case.duration = np.floor(test_case.duration/dt)*dt
                 if tmp_case.duration%dt != 0:
                     tmp_case.duration += dt
 
                 simu_path = os.path.join(sample_path, f'simu_{i}')
-                simu_cfg = get_config(tmp_case, lb_scheme, dx, self.codegen.v_model, exclude=design_space.keys(), codegen_dir=self.tmp_dir.name)
+                simu_cfg = get_config(tmp_case, lb_scheme, dx, self.codegen.v_model, exclude=design_space.keys(), codegen_dir=work_dir)
                 save_simu_config(simu_path, 'simu_config.json', dx, v_model, tmp_case, lb_scheme, {str(k): v for k, v in design_sample.items()}, self.responses.responses_list.v_model)
                 args.append((simu_cfg, design_sample, tmp_case.duration, self.responses.get_list(simu_path, tmp_case, simu_cfg)))
-
-            message.update('Run simulations on the sampling...')
+                design_samples.append(design_sample)
+                sample_cases.append(tmp_case)
+                costs.append(sample_cost(dx, test_case.size(), dt, tmp_case.duration))
+
+            # compute the exact solutions of all the samples at once: the
+            # workers read them from the cache directory given by their
+            # environment, the kernel keeps its own cache
+            exact_dir = os.path.join(work_dir, 'exact_solutions')
+            env = {ExactSolutionCache.env_directory: exact_dir}
+            prepare_exact_solutions(sample_cases, exact_dir)
+
+            branch = None
+            prefix_time = 0
+            if self.branching.v_model and not convergence:
+                # the samples can share the beginning of the simulation
+                # only if they have the same grid and the same time step
+                if any(isinstance(k, str) or k == lb_scheme.la.symb for k in design_space.keys()):
+                    message.update('Branching is only available for the relaxation parameters: run the full simulations')
+                elif not self.branch_time.error and self.branch_time.value < 1:
+                    ref_params = get_config(tmp_case, lb_scheme, dx)['parameters']
+                    reference = {
+                        k: float(ref_params.get(k, np.mean([d[k] for d in design_samples])))
+                        for k in design_samples[0]
+                    }
+                    branch = Checkpoint(
+                        os.path.join(work_dir, 'branch', checkpoint_filename),
+                        checkpoint_key(tmp_case, lb_scheme, dx, reference, self.codegen.v_model)
+                    )
+                    message.update('Run the shared transient...')
+                    branch_time = self.branch_time.value*tmp_case.duration
+                    t1 = time.time()
+                    run_prefix(args[0][0], reference, branch_time, branch)
+                    prefix_time = time.time() - t1
+                    # the samples share the grid and the time step and
+                    # only run after the branch
+                    costs = [sample_cost(dx, test_case.size(), dt, tmp_case.duration - branch_time)]*len(args)
+            args = [a + (branch,) for a in args]
+
+            if isinstance(executor, TCPQueueExecutor):
+                host, port = executor.address
+                message.update(
+                    f'Run simulations on the sampling with {executor.local_workers} local workers and the workers started by '
+                    f'python -m pylbm_ui.executors --connect {host or "<host>"}:{port} --authkey {executor.authkey} '
+                    'on the machines of the study'
+                )
+            elif isinstance(executor, JobDaemonExecutor):
+                max_jobs = executor.start()
+                if max_jobs is not None and max_jobs != executor.max_jobs:
+                    message.update(
+                        f'Run simulations on the sampling with the running job daemon: it runs {max_jobs} '
+                        f'jobs at the same time instead of {executor.max_jobs} (stop it to change this number)'
+                    )
+                else:
+                    message.update('Run simulations on the sampling...')
+            else:
+                message.update('Run simulations on the sampling...')
             
             def run_parametric_study():
-                from pathos.multiprocessing import ProcessingPool
-                from pathos.helpers import cpu_count
-                pool = pp.ProcessPool(nodes=cpu_count()//2)
+                worker = self.get_worker_config()
+                if branch is not None or worker.pinning != 'none':
+                    # fork new workers which inherit the shared state
+                    # and take their place in the core sets in order
+                    executor.clear()
                 t1 = time.time()
-                res = pool.map(run_simulation, args)
-                t2 = time.time()
-                pcp_stats = {}
-                pcp_stats['number of cpu'] = cpu_count()//2
-                pcp_stats['execution time'] = t2 - t1
-                pcp_stats['mean time by evaluation'] = (t2 - t1)/len(args)
-
-                
-                
-                output = [r[0] for r in res]
-                stats = [r[1] for r in res]
-
-                self.results = [dict(values=np.asarray([o[0] for o in output], dtype=np.float64), label='stability')]
-                self.results.extend([dict(values=np.arange(len(output)), label='id')])
-
-                self.results.extend([dict(values=sampling[:, ik], label=f'{k}') for ik, k in enumerate(design_space.keys())])
-
-                for i, r in enumerate(self.responses.widget.v_model):
-                    if output[0][i+1] is not None:
-                        self.results.append(dict(values=np.asarray([o[i+1] for o in output], dtype=np.float64), label=str(self.responses.responses[r])))
+                store = StudyStore(path)
+                # a column by requested response except the plots which
+                # have no value
+                responses_index = [i for i, r in enumerate(args[0][3]) if not isinstance(r, Plot)]
+                labels = ['stability', 'id']
+                labels.extend([f'{k}' for k in design_space.keys()])
+                labels.extend([str(self.responses.responses[self.responses.widget.v_model[i]]) for i in responses_index])
+                store.create_results(labels)
+                outputs = [None]*len(args)
+                # the most expensive samples are dispatched first and each
+                # worker takes a new sample as soon as it is free so that
+                # the last running samples are the shortest ones
+                order = np.argsort(-np.asarray(costs), kind='stable')
+                done_cost, done_time = 0., 0.
+                # the results are appended to the store as soon as a sample
+                # is evaluated
+                tasks = [(i, args[i], worker) for i in order]
+                for isamp, (output, stats) in executor.map(run_sample, tasks, env):
+                    row = [output[0], isamp]
+                    row.extend(sampling[isamp])
+                    # the responses without value are stored as nan
+                    row.extend([output[i+1] for i in responses_index])
+                    store.append_results([row])
 
-                for isamp in range(len(sampling)):
                     tmp_design = {f'{k}': sampling[isamp, ik] for ik, k in enumerate(design_space.keys())}
-                    tmp_responses = {r: output[isamp][ir + 1] for ir, r in enumerate(self.responses.widget.v_model)}
+                    tmp_responses = {r: output[ir + 1] for ir, r in enumerate(self.responses.widget.v_model)}
                     tmp_responses['id'] = isamp
-                    tmp_responses['stability'] = output[isamp][0]
+                    tmp_responses['stability'] = output[0]
                     simu_path = os.path.join(sample_path, f'simu_{isamp}')
                     save_param_study_for_simu(simu_path, 'param_study.json', tmp_design, tmp_responses)
-                    save_stats(simu_path, 'simu_config.json', stats[isamp])
 
-                save_results(path, 'parametric_study.json', self.results)
+                    # the time predicted with the cost of the samples already evaluated
+                    stats['predicted lattice updates'] = costs[isamp]
+                    stats['predicted time'] = costs[isamp]*done_time/done_cost if done_cost > 0 else None
+                    done_cost += costs[isamp]
+                    done_time += stats['LBM']
+                    save_stats(simu_path, 'simu_config.json', stats)
+                    compact_journal(simu_path)
+                    outputs[isamp] = output
+                t2 = time.time()
+                pcp_stats = {}
+                pcp_stats['number of cpu'] = worker.n_workers
+                pcp_stats['threads by worker'] = worker.n_threads
+                pcp_stats['pinning'] = worker.pinning
+                pcp_stats['backend'] = self.backend.v_model
+                pcp_stats['execution time'] = t2 - t1
+                pcp_stats['mean time by evaluation'] = (t2 - t1)/len(args)
+                pcp_stats['scheduling'] = 'longest first'
+                pcp_stats['predicted lattice updates'] = float(np.sum(costs))
+                pcp_stats['time by lattice update'] = done_time/done_cost if done_cost > 0 else None
+                if branch is not None:
+                    pcp_stats['shared transient time'] = prefix_time
+                    _branch_states.pop(branch.filename, None)
+                if branch is not None or worker.pinning != 'none':
+                    executor.clear()
+                executor.close()
+
+                # the rows are stored in the order of the sampling
+                results = store.load_results()
+                rows = np.argsort(results[1]['values'], kind='stable')
+                self.results = [dict(values=r['values'][rows], label=r['label']) for r in results]
+                store.save_results(self.results)
+
+                save_results(path, 'parametric_study.json')
                 save_stats(path, 'parametric_study.json', pcp_stats)
+                self.convergence_plot.children = []
+                if convergence:
+                    report = convergence_report(
+                        [a[0]['space_step'] for a in args], test_case.dim,
+                        self.responses.widget.v_model, args[0][3], outputs
+                    )
+                    append_journal(path, 'parametric_study.json', {'convergence': report})
+                    self.plot_convergence(report)
+                compact_journal(path)
 
                 self.color.items = [{'text': v['label'], 'value': i } for i, v in enumerate(self.results)]
                 self.color.v_model = 0
@@ -391,7 +699,36 @@ class ParametricStudyWidget:
             ))
         ]
 
-        self.plotly_plot.children = [self.color, self.items, self.only_stable, self.fig]
+        self.plotly_plot.children = [self.color, self.items, self.only_stable, self.fig, self.convergence_plot]
+
+    def plot_convergence(self, report):
+        """
+        Plot the errors of a convergence study against dx in log scale
+        with their observed orders.
+        """
+        dx = report['dx']
+        fig = go.FigureWidget()
+        for name, r in report.items():
+            if name == 'dx' or 'errors' not in r:
+                continue
+            fig.add_trace(go.Scatter(
+                x=dx, y=r['errors'], mode='lines+markers',
+                name=f"{name} (order {r['order']:.2f})"
+            ))
+        fig.update_xaxes(type='log', title='dx')
+        fig.update_yaxes(type='log', title='error')
+
+        extrapolations = [
+            v.ListItem(children=[
+                f"{name}: {r['extrapolation']:.6g} (order {r['order']:.2f})"
+            ])
+            for name, r in report.items()
+            if name != 'dx' and 'extrapolation' in r and np.isfinite(r['extrapolation'])
+        ]
+        children = [fig]
+        if extrapolations:
+            children.append(v.List(children=[v.Subheader(children=['Richardson extrapolation'])] + extrapolations))
+        self.convergence_plot.children = children
 
     def stop_simulation(self, change):
         """
@@ -408,6 +745,7 @@ class ParametricStudyWidget:
         """
         self.design.purge()
         self.plotly_plot.children = []
+        self.convergence_plot.children = []
         self.responses.widget.v_model = []
         try:
             shutil.rmtree(self.tmp_dir.name)
@@ -441,6 +779,22 @@ class ParametricStudyWidget:
 
         self.sampling_method.v_model = cfg['sampling_method']
         self.sample_size.value = cfg['sample_size']
+        branching = cfg.get('branching', {})
+        self.branching.v_model = branching.get('active', False)
+        self.branch_time.value = branching.get('time', 0.5)
+        convergence = cfg.get('convergence', {})
+        self.convergence.v_model = convergence.get('active', False)
+        self.refinement_ratio.value = convergence.get('ratio', 2)
+        self.n_levels.value = convergence.get('levels', 4)
+        workers = cfg.get('workers', {})
+        if 'workers' in workers:
+            self.n_workers.value = workers['workers']
+        self.n_threads.value = workers.get('threads by worker', 1)
+        self.pinning.v_model = workers.get('pinning', 'none')
+        executor = cfg.get('executor', {})
+        self.backend.v_model = executor.get('backend', backends[0])
+        self.submit_command.v_model = executor.get('command', default_command)
+        self.queue_address.v_model = executor.get('address', f'{default_address[0]}:{default_address[1]}')
 
         items = []
         for d in cfg['design_space']:
@@ -464,9 +818,7 @@ class ParametricStudyWidget:
 
         self.responses.widget.v_model = cfg['responses']
 
-        self.results = cfg['results']
-        for r in self.results:
-            r['values'] = np.asarray(r['values'])
+        self.results = load_results(os.path.dirname(self.param_cfg.v_model), cfg)
 
         self.color.items = [{'text': v['label'], 'value': i } for i, v in enumerate(self.results)]
         self.color.v_model = 0
@@ -6,10 +6,7 @@
 # License: BSD 3 clause
 
 import os
-import glob
-import hashlib
-import json
-import h5py
+from functools import lru_cache
 
 from matplotlib.lines import Line2D
 import matplotlib.pyplot as plt
@@ -23,6 +20,9 @@ from .debug import debug
 from ..config import default_path, plot_config, voila_notebook
 from ..utils import IntField, FloatField
 from ..simulation import Plot
+from ..results_index import ResultIndex
+from ..h5_cache import H5Cache
+from ..export import ZipExport
 from .pylbmwidget import out
 
 @debug
@@ -48,6 +48,68 @@ class FormProperties_1D:
             ],justify='center'),
         ]
 
+@lru_cache(maxsize=None)
+def colormap_items(n_colors=16):
+    """
+    Return the name and a css gradient of each matplotlib colormap.
+
+    The list is computed once by process and shared by all the pickers.
+    """
+    items = []
+    for index, name in enumerate(plt.colormaps()):
+        colors = plt.get_cmap(name)(np.linspace(0, 1, n_colors))
+        stops = ', '.join(
+            f'rgb({int(255*r)},{int(255*g)},{int(255*b)}) {100*k/(n_colors - 1):.1f}%'
+            for k, (r, g, b, _) in enumerate(colors)
+        )
+        items.append({
+            'index': index,
+            'name': name,
+            'gradient': f'linear-gradient(to right, {stops})'
+        })
+    return items
+
+
+class ColormapPicker(v.VuetifyTemplate):
+    """
+    List of the matplotlib colormaps drawn by the browser with css gradients.
+
+    The list is virtual-scrolled: only the visible colormaps are rendered.
+    v_model is the index of the selected colormap in plt.colormaps().
+    """
+    template = traitlets.Unicode('''
+        <template>
+            <v-virtual-scroll
+                :items="items"
+                item-height="64"
+                height="400"
+                bench="4"
+            >
+                <template v-slot:default="{ item }">
+                    <v-list-item
+                        :key="item.index"
+                        :input-value="item.index === v_model"
+                        color="primary"
+                        @click="v_model = item.index"
+                    >
+                        <v-list-item-content>
+                            <v-list-item-title>{{ item.name }}</v-list-item-title>
+                            <div :style="{background: item.gradient, height: '30px', width: '100%'}"></div>
+                        </v-list-item-content>
+                    </v-list-item>
+                </template>
+            </v-virtual-scroll>
+        </template>
+    ''').tag(sync=True)
+
+    v_model = traitlets.Int(0).tag(sync=True)
+    items = traitlets.List([]).tag(sync=True)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.items = colormap_items()
+
+
 @debug
 class FormProperties_2D:
     def __init__(self):
@@ -55,24 +117,7 @@ class FormProperties_2D:
         self.min_value = FloatField(label='minimum value')
         self.max_value = FloatField(label='maximum value')
 
-        headers=[
-            {'text': 'Name', 'value': 'name'},
-            {'text': 'Color', 'value': 'color'}
-        ]
-
-        self.cmap = v.ListItemGroup(
-            v_model=plt.colormaps().index('RdBu'),
-            children=[
-                v.ListItem(children=[
-                    v.ListItemContent(children=[
-                        v.ListItemTitle(children=[name]),
-                        v.ListItemSubtitle(children=[
-                            v.Img(src=f'pylbm_ui/widgets/cmap/{name}.png', height=30, width=400)
-                        ])
-                    ])
-                ])
-            for name in plt.colormaps()
-        ])
+        self.cmap = ColormapPicker(v_model=plt.colormaps().index('RdBu'))
 
         self.widget = [
             self.label,
@@ -258,6 +303,8 @@ class PostTreatmentWidget:
         )
 
         self.plot = Plot()
+        self.index = ResultIndex(default_path)
+        self.h5_cache = H5Cache()
 
         def select(change):
             with out:
@@ -274,11 +321,10 @@ class PostTreatmentWidget:
                         })
                     elif e['dim'] == 2:
                         h5 = os.path.join(e['directory'], e['file'])
-                        h5_data = h5py.File(h5)
-                        data = h5_data[e['field']][:]
+                        min_value, max_value = self.h5_cache.bounds(h5, e['field'])
                         self.select_table.properties.append({'label': e['field'],
-                                                             'min_value': np.nanmin(data),
-                                                             'max_value': np.nanmax(data),
+                                                             'min_value': min_value,
+                                                             'max_value': max_value,
                                                              'cmap': plt.colormaps().index(plot_config['cmap'])})
                     self.table.items.remove(e)
                 self.table.v_model = []
@@ -306,41 +352,70 @@ class PostTreatmentWidget:
 
         headers_select.observe(update_headers, 'v_model')
 
+        self.export_select = v.Select(label='Results to export',
+                                      hint='all the results if empty',
+                                      persistent_hint=True,
+                                      items=[],
+                                      v_model=[],
+                                      multiple=True,
+                                      clearable=True)
         download_zip = v.Btn(children=['Download results'])
-
-        def create_zip(widget, event, data):
-            from zipfile import ZipFile
-
-            zipfilename = os.path.join(voila_notebook, 'results.zip')
-            with ZipFile(zipfilename, 'w') as zipObj:
-                for folderName, subfolders, filenames in os.walk(default_path):
-                    for filename in filenames:
-                        #create complete filepath of file in directory
-                        filePath = os.path.join(folderName, filename)
-
-                        # Add file to zip
-                        zipObj.write(filePath, filePath.replace(default_path, ''))
-
+        export_progress = v.ProgressLinear(value=0, height=20, class_='d-none')
+
+        def export_progress_bar(done, total):
+            export_progress.value = 100*done/total if total else 100
+            export_progress.children = [f'{done/2**20:.0f} / {total/2**20:.0f} MB']
+
+        def export_done(zipfilename):
+            export_progress.class_ = 'd-none'
+            download_zip.children = ['Download results']
+            if zipfilename is None:
+                if self.export.error is None:
+                    return
+                message = f'The export has failed: {self.export.error}'
+            else:
+                name = os.path.basename(zipfilename)
+                message = f'<a href="./{name}" download="{name}">Download the archive</a>'
             dialog.children = [
                 v.Card(children=[
                     v.CardTitle(children=[
-                        widgets.HTML(f'<a href="./results.zip" download="results.zip">Download the archive</a>')
+                        widgets.HTML(message)
                     ])
-
                 ])
             ]
             dialog.v_model = True
 
+        self.export = ZipExport(default_path, export_progress_bar, export_done)
+
+        def create_zip(widget, event, data):
+            with out:
+                if self.export.running:
+                    self.export.cancel()
+                    return
+                zipfilename = os.path.join(voila_notebook, 'results.zip')
+                export_progress.value = 0
+                export_progress.class_ = ''
+                download_zip.children = ['Cancel export']
+                self.export.start(zipfilename, self.export_select.v_model)
+
         self.title = v.TextField(label='Plot title', v_model='')
         self.xlabel = v.TextField(label='x label', v_model='')
         self.ylabel = v.TextField(label='y label', v_model='')
         self.legend = v.Switch(label='Add legend', v_model=False)
+        self.memmap = v.Switch(label='Memory-mapped reading', v_model=False)
 
         self.title.observe(self.set_plot_properties, 'v_model')
         self.xlabel.observe(self.set_plot_properties, 'v_model')
         self.ylabel.observe(self.set_plot_properties, 'v_model')
         self.legend.observe(self.set_plot_properties, 'v_model')
 
+        def set_memmap(change):
+            self.h5_cache.close()
+            self.h5_cache.memmap = self.memmap.v_model
+            self.plot_result(None)
+
+        self.memmap.observe(set_memmap, 'v_model')
+
         dialog = v.Dialog()
         dialog.v_model = False
         dialog.width = '200'
@@ -353,7 +428,10 @@ class PostTreatmentWidget:
             self.xlabel,
             self.ylabel,
             self.legend,
+            self.memmap,
+            self.export_select,
             download_zip,
+            export_progress,
             dialog
         ]
         self.main = [
@@ -392,13 +470,11 @@ class PostTreatmentWidget:
                 properties = self.select_table.properties[index]
                 domain = Domain()
                 h5 = os.path.join(item['directory'], item['file'])
-                h5_data = h5py.File(h5)
-                domain.x = h5_data['x_0'][:]
-                domain.dim = 1
-                if 'x_1' in h5_data.keys():
-                    domain.y = h5_data['x_1'][:]
-                    domain.dim = 2
-                data = h5_data[item['field']][:]
+                domain.x = self.h5_cache.read(h5, 'x_0')
+                domain.dim = item['dim']
+                if domain.dim == 2:
+                    domain.y = self.h5_cache.read(h5, 'x_1')
+                data = self.h5_cache.read(h5, item['field'])
                 time = item['time']
                 self.plot.plot_type = None
                 self.plot.plot(time, domain, item['field'], data, transpose=False, properties=properties)
@@ -439,56 +515,15 @@ class PostTreatmentWidget:
 
     def update(self, change):
         with out:
-            data = []
-
             if self.select_dim.v_model == 1:
                 self.select_table.single_select = False
             else:
                 self.select_table.single_select = True
 
-            for root, d_names,f_names in os.walk(default_path):
-                if 'simu_config.json' in f_names:
-                    cfg = json.load(open(root + '/simu_config.json'))
-                    if cfg['dim'] == self.select_dim.v_model:
-                        dx = cfg['dx']
-                        la = cfg['lb_scheme']['args']['la']
-                        dt = dx/la
-                        h5files = glob.glob(root + '/*.h5')
-                        for h5 in h5files:
-                            filename = os.path.basename(h5)
-                            dirname = os.path.dirname(os.path.abspath(h5))
-
-                            tmp = os.path.splitext(filename)[0].split('_')
-                            if len(tmp) == 2:
-                                ite = int(os.path.splitext(filename)[0].split('_')[-1])
-
-                                # check if the h5 file is not used for the save process
-                                # which means that the ressource is temporarely unavailable
-                                is_available = False
-                                while (not is_available):
-                                    try:
-                                        h5_data = h5py.File(h5)
-                                        is_available = True
-                                    except OSError:
-                                        pass
-
-                                for k in h5_data.keys():
-                                    if k not in ['x_0', 'x_1', 'x_2']:
-                                        data.append({
-                                                    'iteration': ite,
-                                                    'dim': cfg['dim'],
-                                                    'time': ite*dt,
-                                                    'field': k,
-                                                    'model': cfg['v_model']['model'],
-                                                    'test case': cfg['v_model']['test_case'],
-                                                    'lb scheme': cfg['v_model']['lb_scheme'],
-                                                    'file': filename,
-                                                    'directory': dirname,
-                                        })
-                                        dhash = hashlib.md5()
-                                        encoded = json.dumps(data[-1], sort_keys=True).encode()
-                                        dhash.update(encoded)
-                                        data[-1]['id'] = dhash.hexdigest()
+            self.index.update()
+            data = self.index.items(self.select_dim.v_model)
+            # the directories found by the update of the index
+            self.export_select.items = self.index.result_directories()
 
             items = self.select_table.items
             index = [i for i, item in enumerate(items) if item in data]
@@ -14,6 +14,7 @@ import pylbm
 from .pylbmwidget import out
 
 from .. import responses as pylbm_responses
+from ..utils import StrictlyPositiveFloatField
 from schema.utils import RelaxationParameterFinal
 
 class CFL:
@@ -74,6 +75,7 @@ class Plot:
 def build_responses_list(test_case, lb_scheme):
     responses = {'linear stability': pylbm_responses.LinearStability(test_case.state()),
                  'CFL': CFL(test_case),
+                 'time to steady state': pylbm_responses.SteadyState(),
     }
 
     fields = test_case.equation.get_fields()
@@ -82,8 +84,9 @@ def build_responses_list(test_case, lb_scheme):
         if hasattr(test_case, 'ref_solution'):
             # responses[f'stability on {name}'] = pylbm_responses.Stability(expr)
             responses[f'log of abs error on {name}'] = Error(name, expr)
-            responses[f'log of avg error on {name}'] = pylbm_responses.ErrorAvg(name, test_case.ref_solution, expr)
-            responses[f'log of std error on {name}'] = pylbm_responses.ErrorStd(name, test_case.ref_solution, expr)
+            ref_many = getattr(test_case, 'ref_solution_many', None)
+            responses[f'log of avg error on {name}'] = pylbm_responses.ErrorAvg(name, test_case.ref_solution, expr, ref_func_many=ref_many)
+            responses[f'log of std error on {name}'] = pylbm_responses.ErrorStd(name, test_case.ref_solution, expr, ref_func_many=ref_many)
             responses[f'log of rel error on {name}'] = Error(name, expr, relative=True)
 
     def add_relax(v):
@@ -107,6 +110,10 @@ class ResponsesWidget:
         self.responses = {}
 
         self.responses_list = v.Select(label='Responses', v_model=[], items=[], multiple=True)
+        self.steady_tol = StrictlyPositiveFloatField(
+            label='Steady state tolerance', v_model=1e-4,
+            hint='the simulations stop at the steady state when the response time to steady state is selected'
+        )
 
 
         def update_responses(change):
@@ -136,6 +143,8 @@ class ResponsesWidget:
                                               pylbm_responses.DuringSimulation,
                                               pylbm_responses.AfterSimulation,)):
                 output.append(copy.deepcopy(self.responses[v]))
+                if isinstance(output[-1], pylbm_responses.SteadyState):
+                    output[-1].tol = self.steady_tol.value
             else:
                 output.append(copy.deepcopy(self.responses[v](path, test_case, simu_cfg)))
         return output
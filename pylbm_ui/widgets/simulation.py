@@ -19,6 +19,11 @@ from .pylbmwidget import Tooltip
 from .dialog_path import DialogPath
 from ..config import default_path, nb_split_period
 from ..simulation import simulation, Plot
+from ..responses import ResidualMonitor
+from ..coarse_to_fine import run_coarse_to_fine
+from ..checkpoint import Checkpoint, checkpoint_key, checkpoint_filename
+from ..jobs import JobQueue, finished_states, queued, running
+from ..json import save_simu_config
 from ..utils import StrictlyPositiveIntField, StrictlyPositiveFloatField
 from .message import Message
 from .debug import debug
@@ -56,6 +61,8 @@ class SimulationWidget:
         lb_param = lb_scheme_widget.parameters
 
         self.stats = {}
+        # the first iteration of the current run (not 0 after a resume)
+        self.nt0 = 0
         ##
         ## The menu
         ##
@@ -87,6 +94,38 @@ class SimulationWidget:
         # self.fix_axis_ymin.hide()
         # self.fix_axis_ymax.hide()
 
+        self.checkpoints = v.Switch(label='Save checkpoints', v_model=False)
+        self.checkpoint_period = StrictlyPositiveFloatField(
+            label='Period (minutes)', v_model=10
+        )
+        self.resume = v.Switch(label='Resume from checkpoint', v_model=False)
+
+        self.steady = v.Switch(label='Stop at steady state', v_model=False)
+        self.steady_tol = StrictlyPositiveFloatField(
+            label='Tolerance', v_model=1e-4,
+            hint='relative change of the conserved moments by unit of time'
+        )
+
+        self.coarse_to_fine = v.Switch(label='Initialize from coarse grids', v_model=False)
+        self.coarse_dx = v.TextField(
+            label='Coarse space steps', v_model='',
+            hint='comma separated list of space steps larger than dx'
+        )
+
+        self.background = v.Switch(label='Run in the job daemon', v_model=False)
+        self.jobs = v.Select(label='Attach to a job', items=[], v_model=None)
+        self.refresh_jobs = v.Btn(children=['Refresh'], class_='ma-2')
+        self.max_jobs = StrictlyPositiveIntField(
+            label='Simulations running at the same time', v_model=max(1, (os.cpu_count() or 1)//2),
+            hint='used when the job daemon is started'
+        )
+        self.job_queue = JobQueue()
+        self.job_id = None
+        self.cancel_job = False
+        self.queued_jobs = []
+        self.following_queue = False
+        self.update_jobs_list()
+
         self.menu = [
             self.simulation_name,
             self.simu_cfg,
@@ -102,6 +141,31 @@ class SimulationWidget:
                         self.save_fields.widget
                     ]),
                 ]),
+                v.ExpansionPanel(children=[
+                    v.ExpansionPanelHeader(children=['Checkpoints']),
+                    v.ExpansionPanelContent(children=[
+                        self.checkpoints, self.checkpoint_period, self.resume
+                    ]),
+                ]),
+                v.ExpansionPanel(children=[
+                    v.ExpansionPanelHeader(children=['Steady state']),
+                    v.ExpansionPanelContent(children=[
+                        self.steady, self.steady_tol
+                    ]),
+                ]),
+                v.ExpansionPanel(children=[
+                    v.ExpansionPanelHeader(children=['Job daemon']),
+                    v.ExpansionPanelContent(children=[
+                        self.background, self.max_jobs,
+                        v.Row(children=[self.jobs, self.refresh_jobs], align='center', class_='ma-0'),
+                    ]),
+                ]),
+                v.ExpansionPanel(children=[
+                    v.ExpansionPanelHeader(children=['Coarse to fine']),
+                    v.ExpansionPanelContent(children=[
+                        self.coarse_to_fine, self.coarse_dx
+                    ]),
+                ]),
                 v.ExpansionPanel(children=[
                     v.ExpansionPanelHeader(children=['Graphic options']),
                     v.ExpansionPanelContent(children=[
@@ -138,10 +202,26 @@ class SimulationWidget:
 
         self.dialog = DialogPath()
 
+        self.enqueue = v.Btn(children=['Add to queue'], class_='ma-2')
+        self.queue_table = v.DataTable(
+            headers=[
+                {'text': 'Simulation', 'value': 'name'},
+                {'text': 'State', 'value': 'state'},
+                {'text': 'Progress', 'value': 'progress'},
+                {'text': 'MLUPS', 'value': 'mlups'},
+                {'text': 'Outputs', 'value': 'outputs'},
+            ],
+            items=[],
+            item_key='id',
+            dense=True,
+            class_='d-none',
+        )
+
         self.main = [
             v.Row(children=[
                 self.startTooltip,
                 Tooltip(self.pause, tooltip='click to pause the simulation'),
+                Tooltip(self.enqueue, tooltip='run the current configuration in the background'),
                 self.dialog,
             ]),
             self.progress_bar,
@@ -151,6 +231,7 @@ class SimulationWidget:
                 v.Col(children=[self.snapshot], md=2, sm=12),
             ], align='center', justify='space-around', ),
             self.plot_output,
+            self.queue_table,
         ]
 
         ##
@@ -158,12 +239,15 @@ class SimulationWidget:
         ##
 
         self.start.on_event('click', self.start_simulation)
+        self.enqueue.on_event('click', self.enqueue_simulation)
         self.pause.on_event('click', self.on_pause_click)
         self.snapshot.on_event('click', self.take_snapshot)
         self.result.observe(self.replot, 'v_model')
         self.simu_cfg.observe(self.load_simu_cfg, 'v_model')
         self.discret['nt'].observe(self.change_period_by_nt, 'v_model')
         self.fix_axis.observe(self.on_fix_axis_click, 'v_model')
+        self.jobs.observe(self.on_job_selected, 'v_model')
+        self.refresh_jobs.on_event('click', lambda *args: self.update_jobs_list())
 
         test_case_widget.select_case.observe(self.stop_simulation, 'v_model')
         lb_scheme_widget.select_case.observe(self.stop_simulation, 'v_model')
@@ -188,10 +272,10 @@ class SimulationWidget:
         simu_list.sort()
         self.simu_cfg.items = simu_list
 
-    def stop_simulation(self, change):
+    def reset_buttons(self):
         """
-        When the stop button is clicked replace it by the start button
-        and disable the pause button.
+        Replace the stop button by the start button and disable the
+        pause button.
         """
         self.start.v_model = True
         self.start.children = ['Start']
@@ -200,9 +284,24 @@ class SimulationWidget:
         self.pause.disabled = True
         self.pause.v_model = False
 
+    def stop_simulation(self, change):
+        """
+        When the stop button is clicked replace it by the start button
+        and disable the pause button.
+        """
+        self.reset_buttons()
+
+        if self.job_id is not None:
+            # the job daemon saves the statistics of its simulations
+            if not self.cancel_job:
+                # only the stop button cancels the job: the UI is detached
+                self.job_id = None
+            self.update_jobs_list()
+            return
+
         sol = self.simu.sol
         if sol:
-            self.stats['MLUPS'] = sol.nt*np.prod(sol.domain.shape_in)/self.stats['LBM']/1e6
+            self.stats['MLUPS'] = (sol.nt - self.nt0)*np.prod(sol.domain.shape_in)/self.stats['LBM']/1e6
         self.simu.save_stats(self.stats)
 
     def update_result(self, change):
@@ -254,13 +353,46 @@ class SimulationWidget:
         self.simu.reset_path(
             os.path.join(default_path, self.simulation_name.v_model)
         )
-        self.simu.reset_sol(
-            v_model,
-            test_case, lb_scheme,
-            self.discret['dx'].value,
-            self.codegen.v_model
-        )
-        self.simu.save_config()
+        dx = self.discret['dx'].value
+        coarse_dx = self.get_coarse_dx(dx)
+        if coarse_dx and not self.resume.v_model:
+            def on_level(level, dx_level):
+                if level < len(coarse_dx):
+                    self.plot_output.children = [Message(f'Run the coarse grid dx={dx_level:g}')]
+
+            steady_tol = None
+            if self.steady.v_model and not self.steady_tol.error:
+                steady_tol = self.steady_tol.value
+
+            t1 = time.time()
+            self.stats['coarse to fine'] = {
+                'levels': run_coarse_to_fine(
+                    self.simu, v_model, test_case, lb_scheme,
+                    coarse_dx + [dx], self.codegen.v_model,
+                    steady_tol=steady_tol, run_last=False,
+                    on_level=on_level
+                ),
+                'time': time.time() - t1,
+            }
+        else:
+            self.simu.reset_sol(
+                v_model,
+                test_case, lb_scheme,
+                dx,
+                self.codegen.v_model
+            )
+        try:
+            resumed = self.resume.v_model and self.simu.resume()
+        except ValueError as e:
+            # don't overwrite the files of the simulation to resume
+            self.plot_output.children = [v.Alert(children=[f'Cannot resume the simulation: {e}'], type='error')]
+            self.reset_buttons()
+            return
+        if not resumed:
+            self.simu.save_config()
+        self.nt0 = self.simu.sol.nt
+        if not self.checkpoint_period.error:
+            self.simu.checkpoint.period = 60*self.checkpoint_period.value
 
         self.plot = Plot()
         self.iplot = 0
@@ -288,6 +420,10 @@ class SimulationWidget:
         nite = 1
         stop_time = self.simu.duration - .5*self.simu.sol.dt
 
+        monitor = None
+        if self.steady.v_model and not self.steady_tol.error:
+            monitor = ResidualMonitor(self.steady_tol.value)
+
         await asyncio.sleep(0.01)
         while self.simu.sol.t < stop_time:
             self.progress_bar.value = float(
@@ -318,6 +454,13 @@ class SimulationWidget:
                 nite += 1
                 self.iplot += 1
 
+                if self.checkpoints.v_model:
+                    self.simu.checkpoint(self.simu.sol)
+
+                if monitor is not None and monitor(self.simu.duration, self.simu.sol):
+                    self.stats['steady_time'] = self.simu.sol.t
+                    break
+
             if self.simu.sol.dim == 1:
                 await asyncio.sleep(0.001)
             else:
@@ -332,10 +475,241 @@ class SimulationWidget:
             self.plot_output.children[0].draw_idle()
         if self.simu.sol.nt in ite_to_save:
             self.simu.save_data(ite_to_save[self.simu.sol.nt])
+        if self.checkpoints.v_model:
+            self.simu.checkpoint.save(self.simu.sol)
 
         # stop the simulation
         self.stop_simulation(None)
 
+    def get_coarse_dx(self, dx):
+        """
+        Return the space steps of the coarse grids larger than dx
+        or an empty list if the coarse to fine initialization is not used.
+        """
+        if not self.coarse_to_fine.v_model:
+            return []
+        try:
+            values = [float(d) for d in self.coarse_dx.v_model.replace(';', ',').split(',') if d.strip()]
+        except ValueError:
+            return []
+        return sorted({d for d in values if d > dx}, reverse=True)
+
+    def update_jobs_list(self):
+        """
+        Update the list of the simulations queued or running in the job daemon.
+        """
+        items = []
+        for job_id in self.job_queue.jobs([queued, running]):
+            job = self.job_queue.job(job_id)
+            if job['kind'] == 'simulation':
+                items.append({
+                    'text': f"{os.path.basename(job['spec']['path'])} ({job_id})",
+                    'value': job_id
+                })
+        self.jobs.items = items
+
+    async def run_job(self):
+        """
+        Submit the simulation to the job daemon and follow it.
+        """
+        while self.dialog.v_model:
+            await asyncio.sleep(0.01)
+
+        if not self.dialog.replace:
+            self.stop_simulation(None)
+            return
+
+        path = os.path.join(default_path, self.simulation_name.v_model)
+        resume = self.resume.v_model and os.path.exists(os.path.join(path, checkpoint_filename))
+        job_id = self.submit_job(path, resume)
+        await self.attach_job(job_id)
+
+    def submit_job(self, path, resume=False):
+        """
+        Save the current configuration of the simulation in path and
+        submit it to the job daemon.
+
+        Return the id of the job.
+        """
+        v_model = {
+            'model': self.test_case_widget.model.select_model.v_model,
+            'test_case': self.test_case_widget.select_case.v_model,
+            'lb_scheme': self.lb_scheme_widget.select_case.v_model,
+        }
+        test_case = self.test_case_widget.get_case()
+        lb_scheme = self.lb_scheme_widget.get_case()
+        dx = self.discret['dx'].value
+
+        if not resume:
+            save_simu_config(path, 'simu_config.json', dx, v_model, test_case, lb_scheme)
+
+        dt = dx/lb_scheme.la.value
+        spec = {
+            'path': path,
+            'codegen': self.codegen.v_model,
+            'save': {
+                str(nt): sorted(fields)
+                for nt, fields in self.save_fields.get_save_time(dt, test_case.duration).items()
+            },
+            'field': self.result.v_model,
+            'resume': resume,
+            'checkpoint': self.checkpoint_period.value if self.checkpoints.v_model and not self.checkpoint_period.error else None,
+            'steady_tol': self.steady_tol.value if self.steady.v_model and not self.steady_tol.error else None,
+        }
+        requested = None if self.max_jobs.error else self.max_jobs.value
+        max_jobs = self.job_queue.start_daemon(requested)
+        if requested is not None and max_jobs is not None and max_jobs != requested:
+            self.max_jobs.messages = [f'the running daemon runs {max_jobs} simulations at the same time: stop it to change this number']
+        else:
+            self.max_jobs.messages = []
+        job_id = self.job_queue.submit('simulation', spec)
+        self.update_jobs_list()
+        return job_id
+
+    def free_simulation_name(self, name):
+        """
+        Return name if there is no simulation with this name, otherwise
+        the name with the first free index.
+        """
+        if not os.path.exists(os.path.join(default_path, name)):
+            return name
+        base, _, index = name.rpartition('_')
+        if not base or not index.isdigit():
+            base, index = name, 0
+        index = int(index)
+        while os.path.exists(os.path.join(default_path, f'{base}_{index}')):
+            index += 1
+        return f'{base}_{index}'
+
+    def enqueue_simulation(self, widget, event, data):
+        """
+        Add the current configuration to the queue of the job daemon
+        in a new output directory.
+        """
+        name = self.free_simulation_name(self.simulation_name.v_model)
+        self.queued_jobs.append(self.submit_job(os.path.join(default_path, name)))
+        # the next configuration goes to another directory
+        self.simulation_name.v_model = self.free_simulation_name(name)
+        self.update_queue_table()
+        if not self.following_queue:
+            asyncio.ensure_future(self.follow_queue())
+
+    def update_queue_table(self):
+        """
+        Update the table of the simulations added to the queue.
+        """
+        items = []
+        for job_id in reversed(self.queued_jobs):
+            try:
+                job = self.job_queue.job(job_id)
+            except OSError:
+                continue
+            status = self.job_queue.status(job_id)
+            path = job['spec']['path']
+            mlups = status.get('mlups')
+            outputs = [
+                f for f in os.listdir(path)
+                if f.endswith('.h5') and f != checkpoint_filename
+            ] if os.path.isdir(path) else []
+            items.append({
+                'id': job_id,
+                'name': os.path.basename(path),
+                'state': status['state'],
+                'progress': f"{status.get('progress', 0):.0f}%",
+                'mlups': '' if mlups is None else f'{mlups:.2f}',
+                'outputs': len(outputs),
+            })
+        self.queue_table.items = items
+        self.queue_table.class_ = '' if items else 'd-none'
+
+    async def follow_queue(self):
+        """
+        Refresh the table of the queue until all its jobs are finished.
+        """
+        self.following_queue = True
+        try:
+            while True:
+                self.update_queue_table()
+                if all(self.job_queue.status(j)['state'] in finished_states for j in self.queued_jobs):
+                    break
+                await asyncio.sleep(1)
+        finally:
+            self.following_queue = False
+        self.update_jobs_list()
+
+    async def attach_job(self, job_id):
+        """
+        Follow the progress of a simulation of the job daemon until it's
+        finished. The stop button cancels the job: the other stops (a new
+        test case or scheme) only detach the UI and the job goes on.
+        """
+        self.job_id = job_id
+        self.cancel_job = False
+        message = Message(f'Job {job_id}')
+        self.plot_output.children = [message]
+        self.pause.disabled = True
+
+        while True:
+            if self.job_id != job_id:
+                message.update(f"Job {job_id}: detached, select it in the job daemon panel to follow it again")
+                return
+
+            status = self.job_queue.status(job_id)
+            self.progress_bar.value = float(status.get('progress', 0))
+            info = f"Job {job_id}: {status['state']}"
+            if 't' in status:
+                info += f" (t={status['t']:g}, iteration {status['nt']})"
+            message.update(info)
+
+            if status['state'] in finished_states:
+                if status.get('message'):
+                    message.update(f"Job {job_id}: {status['state']}\n{status['message']}")
+                break
+            if self.cancel_job:
+                self.job_queue.cancel(job_id)
+            await asyncio.sleep(0.5)
+
+        self.stop_simulation(None)
+        self.job_id = None
+        self.cancel_job = False
+
+    def on_job_selected(self, change):
+        """
+        Reattach the UI to a simulation running in the job daemon.
+        """
+        job_id = self.jobs.v_model
+        if job_id is None:
+            return
+        self.jobs.v_model = None
+        if self.job_id is not None or not self.start.v_model:
+            # the UI is already busy
+            return
+
+        self.start.v_model = False
+        self.start.children = ['Stop']
+        self.start.color = 'error'
+        self.progress_bar.value = 0
+        asyncio.ensure_future(self.attach_job(job_id))
+
+    def resume_error(self, path):
+        """
+        Return why the checkpoint of path can't be restored with the
+        current configuration or None if it can.
+        """
+        checkpoint = Checkpoint(
+            os.path.join(path, checkpoint_filename),
+            checkpoint_key(
+                self.test_case_widget.get_case(), self.lb_scheme_widget.get_case(),
+                self.discret['dx'].value, codegen=self.codegen.v_model
+            )
+        )
+        if not checkpoint.is_compatible():
+            return (
+                f'The checkpoint of {path} was written with another configuration '
+                '(test case, scheme, space step or generator): '
+                'restore this configuration or uncheck resume'
+            )
+
     def start_simulation(self, widget, event, data):
         """
         When the start button is clicked, check if the simulation path is empty,
@@ -344,7 +718,15 @@ class SimulationWidget:
         """
         if self.start.v_model:
             simu_path = os.path.join(default_path, self.simulation_name.v_model)
-            self.dialog.check_path(simu_path)
+            if self.resume.v_model and os.path.exists(os.path.join(simu_path, checkpoint_filename)):
+                error = self.resume_error(simu_path)
+                if error:
+                    self.plot_output.children = [v.Alert(children=[error], type='error')]
+                    return
+                # keep the files of the simulation to resume
+                self.dialog.replace = True
+            else:
+                self.dialog.check_path(simu_path)
 
             self.start.v_model = False
             self.start.children = ['Stop']
@@ -354,9 +736,14 @@ class SimulationWidget:
             self.progress_bar.value = 0
 
             self.stats = {'LBM': 0}
-            asyncio.ensure_future(self.run_simu())
+            if self.background.v_model:
+                asyncio.ensure_future(self.run_job())
+            else:
+                asyncio.ensure_future(self.run_simu())
             # self.run_simu()
         else:
+            if self.job_id is not None:
+                self.cancel_job = True
             self.stop_simulation(None)
 
     def on_pause_click(self, widget, event, data):
@@ -0,0 +1,171 @@
+# Authors:
+#     Loic Gouarin <loic.gouarin@polytechnique.edu>
+#     Benjamin Graille <benjamin.graille@universite-paris-saclay.fr>
+#     Thibaut Van Hoof <thibaut.vanhoof@cenaero.be>
+#
+# License: BSD 3 clause
+
+import glob
+import os
+
+# the environment variables read by the OpenMP and BLAS runtimes
+thread_variables = [
+    'OMP_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'BLIS_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+]
+
+pinning_methods = ['none', 'cores', 'NUMA nodes']
+
+# the index of a worker given by the executors which don't run the tasks
+# in a pool (see executors.py and jobs.py)
+env_worker_index = 'PYLBM_UI_WORKER_INDEX'
+
+# the configuration already applied in this process
+_applied = None
+
+
+def available_cpus():
+    """Return the sorted list of the cpus this process can run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def parse_cpulist(cpulist):
+    """Return the cpus of a list like '0-3,8,10-11'."""
+    cpus = []
+    for part in cpulist.strip().split(','):
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-')
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def numa_nodes():
+    """
+    Return the cpus of each NUMA node (a single node if the topology
+    is not available).
+    """
+    nodes = []
+    for filename in sorted(
+        glob.glob('/sys/devices/system/node/node[0-9]*/cpulist'),
+        key=lambda f: int(os.path.basename(os.path.dirname(f))[4:])
+    ):
+        with open(filename) as f:
+            cpus = parse_cpulist(f.read())
+        if cpus:
+            nodes.append(cpus)
+    return nodes or [available_cpus()]
+
+
+def limit_threads(n_threads):
+    """
+    Limit the number of threads of OpenMP and of the BLAS libraries.
+
+    The environment variables are read by the runtimes loaded later
+    (the OpenMP kernels generated by pylbm) and threadpoolctl, if
+    installed, limits the libraries already loaded.
+    """
+    for var in thread_variables:
+        os.environ[var] = str(n_threads)
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(limits=n_threads)
+
+
+class WorkerConfig:
+    """
+    Configuration of the processes of a parametric study.
+
+    Parameters
+    ==========
+
+    - n_workers: int
+        the number of processes.
+
+    - n_threads: int
+        the number of threads by process (default is 1).
+
+    - pinning: str
+        'none', 'cores' to bind each process to its own set of
+        n_threads cores or 'NUMA nodes' to bind the processes to the
+        NUMA nodes in a round robin way (default is 'none').
+
+    """
+    def __init__(self, n_workers, n_threads=1, pinning='none'):
+        if pinning not in pinning_methods:
+            raise ValueError(f'unknown pinning method {pinning}: use one of {pinning_methods}')
+        self.n_workers = n_workers
+        self.n_threads = n_threads
+        self.pinning = pinning
+
+    def key(self):
+        return (self.n_workers, self.n_threads, self.pinning)
+
+    def cpus(self, index):
+        """Return the cpus of the worker index or None if it's not pinned."""
+        if self.pinning == 'cores':
+            cpus = available_cpus()
+            start = (index % self.n_workers)*self.n_threads % len(cpus)
+            return [cpus[(start + i) % len(cpus)] for i in range(min(self.n_threads, len(cpus)))]
+        if self.pinning == 'NUMA nodes':
+            nodes = numa_nodes()
+            allowed = set(available_cpus())
+            return [c for c in nodes[index % len(nodes)] if c in allowed] or None
+        return None
+
+    def apply(self, index=None):
+        """
+        Configure the current process as the worker index.
+
+        If index is None, it's given by worker_index: the process is
+        not pinned if its index is unknown since all the workers would
+        share the same cpus. The configuration is applied once by process.
+        """
+        global _applied
+        if index is None:
+            index = worker_index()
+        key = self.key() + (index,)
+        if _applied == key:
+            return
+
+        limit_threads(self.n_threads)
+        cpus = self.cpus(index) if index is not None else None
+        if cpus and hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, cpus)
+        _applied = key
+
+    def to_json(self):
+        return {
+            'workers': self.n_workers,
+            'threads by worker': self.n_threads,
+            'pinning': self.pinning,
+        }
+
+
+def worker_index():
+    """
+    Return the index of the current process among the workers: the
+    index given by the executor in the environment variable
+    PYLBM_UI_WORKER_INDEX or the identity of the process in its pool.
+
+    None is returned if the index is unknown.
+    """
+    if os.environ.get(env_worker_index):
+        return int(os.environ[env_worker_index])
+    try:
+        from multiprocess import current_process
+    except ImportError:
+        from multiprocessing import current_process
+    identity = current_process()._identity
+    return identity[-1] - 1 if identity else None
@@ -9,7 +9,7 @@ isothermal Euler
 
 import numpy as np
 import matplotlib.pyplot as plt
-from .riemann_solvers import GenericSolver, solve
+from .riemann_solvers import GenericSolver
 
 
 class EulerIsothermalSolver(GenericSolver):
@@ -23,6 +23,8 @@ class EulerIsothermalSolver(GenericSolver):
     E = rho u^2/2 + c_0^2/(gamma-1) rho
     e = c_0^2/(gamma-1) => c_0^2 = (gamma-1) e
     """
+    default_parameters = {'sound_speed': 0.5}
+
     def _read_particular_parameters(self, parameters):
         self.sound_speed = parameters.get('sound_speed', 0.5)
         if self.sound_speed < 0:
@@ -33,11 +35,7 @@ class EulerIsothermalSolver(GenericSolver):
         """
         Compute the intermediate state
         """
-        rho_star = solve(
-            self._f1, self._f2,
-            self.u_left[0], self.u_right[0],
-            self.epsilon
-        )
+        rho_star = self._solve_star()
         u_star = .5*(self._f1(rho_star)[0]+self._f2(rho_star)[0])
         self.u_star = np.array([rho_star, u_star])
 
@@ -95,6 +93,30 @@ class EulerIsothermalSolver(GenericSolver):
             self.waves.append('shock')
         self.values.append(self.u_right)
 
+    @classmethod
+    def _wave_many(cls, x, state, sign, parameters):
+        """
+        vectorized 1-wave (sign=-1) or 2-wave (sign=1)
+        parametrized by the density
+        """
+        rho, u = state[0], state[1]
+        sound_speed = np.abs(parameters['sound_speed'])
+
+        # rarefaction
+        u_rar = u + sign * sound_speed * np.log(x/rho)
+        du_rar = sign * sound_speed / x
+        # shock
+        rapport = np.sqrt(x/rho)
+        irapport = 1/rapport
+        u_sho = u + sign * sound_speed * (rapport - irapport)
+        du_sho = sign * .5*sound_speed / x * (rapport + irapport)
+
+        rarefaction = x <= rho
+        return (
+            np.where(rarefaction, u_rar, u_sho),
+            np.where(rarefaction, du_rar, du_sho)
+        )
+
     def _f1(self, rho_star):
         """
         Compute the 1-wave that links the left state
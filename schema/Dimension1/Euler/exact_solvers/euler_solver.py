@@ -9,7 +9,7 @@ compressible Euler (with temperature)
 
 import numpy as np
 import matplotlib.pyplot as plt
-from .riemann_solvers import GenericSolver, solve
+from .riemann_solvers import GenericSolver
 
 
 class EulerSolver(GenericSolver):
@@ -27,6 +27,9 @@ class EulerSolver(GenericSolver):
     The 3 variables used to parametrize the solution are
     rho, u, and p.
     """
+    star_index = 2
+    default_parameters = {'gamma': 1.4}
+
     def __init__(self, parameters):
         self.rho_k1 = self.u_k1 = self.p_k1 = self.lambda_l = None
         self.rho_k3 = self.u_k3 = self.p_k3 = self.lambda_r = None
@@ -44,11 +47,7 @@ class EulerSolver(GenericSolver):
         """
         Compute the intermediate state
         """
-        p_star = solve(
-            self._f1, self._f2,
-            self.u_left[2], self.u_right[2],
-            self.epsilon
-        )
+        p_star = self._solve_star()
         u_star = .5*(self._f1(p_star)[0]+self._f2(p_star)[0])
         # compute rho_star
         if p_star < self.u_left[2]:  # 1-rarefaction
@@ -161,6 +160,34 @@ class EulerSolver(GenericSolver):
             self.waves.append('shock')
         self.values.append(self.u_right)
 
+    @classmethod
+    def _wave_many(cls, x, state, sign, parameters):
+        """
+        vectorized 1-wave (sign=-1) or 3-wave (sign=1)
+        parametrized by the pressure
+        """
+        rho, u, p = state[0], state[1], state[2]
+        gamma = parameters['gamma']
+        mu2 = (gamma-1) / (gamma+1)
+        facteur = np.sqrt(1-mu2**2)/mu2
+        exposant1 = 1/(2*gamma)
+        exposant2 = (gamma-1)*exposant1
+
+        # rarefaction
+        coef = facteur * p**exposant1/np.sqrt(rho)
+        u_rar = u + sign * coef * (x**exposant2 - p**exposant2)
+        du_rar = sign * coef * exposant2 * x**(exposant2-1)
+        # shock
+        coef = np.sqrt((1-mu2) / rho / (x+mu2*p))
+        u_sho = u + sign * coef * (x - p)
+        du_sho = sign * coef * (1 - .5 * (x - p) / (x+mu2*p))
+
+        rarefaction = x <= p
+        return (
+            np.where(rarefaction, u_rar, u_sho),
+            np.where(rarefaction, du_rar, du_sho)
+        )
+
     def _f1(self, p_star):
         """
         Compute the 1-wave that links the left state
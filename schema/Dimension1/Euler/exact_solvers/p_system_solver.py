@@ -19,6 +19,8 @@ class PSystemSolver(GenericSolver):
 
     with p(x) = - x^(-gamma)
     """
+    default_parameters = {'gamma': 2./3.}
+
     def _read_particular_parameters(self, parameters):
         self.gamma = parameters.get('gamma', 2./3.)
         self.fields = parameters.get('fields name', [r'$u_1$', r'$u_2$'])
@@ -40,12 +42,15 @@ class PSystemSolver(GenericSolver):
         """
         Compute the intermediate state
         """
-        x = .5*(self.u_left[0]+self.u_right[0])
+        if self.star_value is not None:
+            u1_star = self.star_value
+        else:
+            x = .5*(self.u_left[0]+self.u_right[0])
 
-        def phi(x):
-            return self._f1(x) - self._f2(x)
+            def phi(x):
+                return self._f1(x) - self._f2(x)
 
-        u1_star = newton(phi, x, self.epsilon)
+            u1_star = newton(phi, x, self.epsilon)
         u2_star = self._f1(u1_star)[0]
         self.u_star = np.array([u1_star, u2_star])
 
@@ -100,6 +105,33 @@ class PSystemSolver(GenericSolver):
         self.values.append(self.u_right)
         return self.velocities
 
+    @classmethod
+    def _wave_many(cls, x, state, sign, parameters):
+        """
+        vectorized 1-wave (sign=-1) or 2-wave (sign=1)
+        parametrized by the first component u1
+        """
+        u1, u2 = state[0], state[1]
+        gamma = parameters['gamma']
+        alpha = -.5*(gamma-1)
+        pu1 = -x**(-gamma)
+        dpu1 = gamma*x**(-gamma-1)
+        pu1_k = -u1**(-gamma)
+
+        # rarefaction
+        u2_rar = u2 - sign*np.sqrt(gamma)/alpha*(x**alpha-u1**alpha)
+        du2_rar = -sign*np.sqrt(dpu1)
+        # shock
+        root = np.sqrt(np.abs((pu1-pu1_k)*(x-u1)))
+        u2_sho = u2 + sign*root
+        du2_sho = sign*(dpu1*(x-u1)+pu1-pu1_k)/np.where(root > 0, root, 1)/2
+
+        rarefaction = x >= u1
+        return (
+            np.where(rarefaction, u2_rar, u2_sho),
+            np.where(rarefaction, du2_rar, du2_sho)
+        )
+
     def _f1(self, u1_star):
         """
         Compute the 1-wave that links the left state
@@ -92,10 +92,80 @@ def solve(f1, f2, xa, xb, eps, nitermax=1000):
     return pstar[0]
 
 
+def solve_many(f1, f2, xa, xb, eps, nitermax=100):
+    """
+    solve f1(x) = f2(x) for several problems at once with a
+    vectorized Newton method
+
+    f1 and f2 return the values and the derivatives for an array x
+    and xa, xb are the arrays of the left and right values
+
+    the initialization is the intersection of the two tangents
+    proposed by Francois Dubois (see solve)
+    if the intersection point is negative, xa and xb are switched
+    and if it is still negative, the mean value is used
+
+    the problems without solution are set to nan
+    """
+    xa = np.asarray(xa, dtype=np.float64)
+    xb = np.asarray(xb, dtype=np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        ya, dya = f1(xa)
+        yb, dyb = f2(xb)
+        x = (ya - xa * dya - yb + xb * dyb) / (dyb - dya)
+
+        bad = np.logical_not(x > 0)
+        if np.any(bad):
+            ya, dya = f2(xa)
+            yb, dyb = f1(xb)
+            x_switch = (ya - xa * dya - yb + xb * dyb) / (dyb - dya)
+            x = np.where(bad, x_switch, x)
+
+        bad = np.logical_not(np.logical_and(x > 0, np.isfinite(x)))
+        x = np.where(bad, .5*(xa + xb), x)
+
+        active = np.ones(x.shape, dtype=bool)
+        for _ in range(nitermax):
+            y1, dy1 = f1(x)
+            y2, dy2 = f2(x)
+            x_new = x - (y1 - y2) / (dy1 - dy2)
+            # the unknown is positive (pressure, density, height...)
+            x_new = np.where(x_new > 0, x_new, .5*x)
+            converged = np.logical_or(
+                y1 == y2,
+                np.abs(x_new - x) <= eps*np.maximum(np.abs(x), 1.)
+            )
+            x = np.where(active, x_new, x)
+            active = np.logical_and(active, np.logical_not(converged))
+            if not np.any(active):
+                break
+
+        # no positive solution (vacuum) or no convergence
+        y1, _ = f1(x)
+        y2, _ = f2(x)
+        failed = np.logical_not(
+            np.abs(y1 - y2) <= np.sqrt(eps)*np.maximum(np.abs(y1), 1.)
+        )
+        failed = np.logical_or(failed, active)
+
+    if np.any(failed):
+        print("Newton has not converged for {} problems".format(np.count_nonzero(failed)))
+        x = np.where(failed, np.nan, x)
+    return x
+
+
 class GenericSolver(object):
     """
     generic class for the Riemann solver
+
+    the intermediate state is parametrized by the component star_index
+    of the state (the star value): it can be given in the parameters
+    ('star value') to avoid its computation, see solve_many
     """
+    star_index = 0
+    default_parameters = {}
+
     def __init__(self, parameters):
         self._read_parameters(parameters)
         self._read_particular_parameters(parameters)
@@ -112,6 +182,7 @@ class GenericSolver(object):
         self.u_left = parameters.get('left state', None)
         self.u_right = parameters.get('right state', None)
         self.epsilon = parameters.get('Newton precision', 1.e-10)
+        self.star_value = parameters.get('star value', None)
         if self.u_left is None or self.u_right is None:
             print("*"*80)
             print("Error in the parameters of {}".format(type(self).__name__))
@@ -129,6 +200,92 @@ class GenericSolver(object):
     def _compute_interstate(self):
         self.u_star = np.nan * np.ones(self.u_left.shape)
 
+    def _solve_star(self):
+        """
+        compute the star value of the Riemann problem
+        """
+        if self.star_value is not None:
+            return self.star_value
+        return solve(
+            self._f1, self._f2,
+            self.u_left[self.star_index], self.u_right[self.star_index],
+            self.epsilon
+        )
+
+    @classmethod
+    def _wave_many(cls, x, state, sign, parameters):
+        """
+        vectorized wave curve linking the state for the star values x
+
+        sign is -1 for the wave linking the left state and 1 for the
+        wave linking the right state, state has the shape (n, m) and the
+        parameters are arrays of size m
+
+        return the values and the derivatives
+
+        the solvers which don't implement it are built one by one
+        by build_many (see vectorized)
+        """
+        pass
+
+    @classmethod
+    def vectorized(cls):
+        """
+        check if the solver overrides the vectorized wave curves
+        """
+        return cls._wave_many.__func__ is not GenericSolver._wave_many.__func__
+
+    @classmethod
+    def solve_many(cls, left_states, right_states, parameters=None, epsilon=1.e-10):
+        """
+        compute the star values of several Riemann problems at once
+
+        left_states and right_states have the shape (m, n) and the
+        values of the parameters are scalars or arrays of size m
+        """
+        left = np.atleast_2d(np.asarray(left_states, dtype=np.float64)).T
+        right = np.atleast_2d(np.asarray(right_states, dtype=np.float64)).T
+        params = dict(cls.default_parameters)
+        params.update(parameters or {})
+        params = {k: np.asarray(v, dtype=np.float64) for k, v in params.items()}
+
+        return solve_many(
+            lambda x: cls._wave_many(x, left, -1, params),
+            lambda x: cls._wave_many(x, right, 1, params),
+            left[cls.star_index], right[cls.star_index],
+            epsilon
+        )
+
+    @classmethod
+    def build_many(cls, parameters_list):
+        """
+        build the solvers of several Riemann problems
+        the star values are computed at once by solve_many
+
+        the problems for which the vectorized Newton method has failed
+        and the solvers without vectorized wave curves are solved by
+        the scalar method (see _solve_star)
+        """
+        parameters_list = list(parameters_list)
+        if not parameters_list:
+            return []
+        if not cls.vectorized():
+            return [cls(p) for p in parameters_list]
+        params = {
+            k: [p.get(k, v) for p in parameters_list]
+            for k, v in cls.default_parameters.items()
+        }
+        stars = cls.solve_many(
+            [p['left state'] for p in parameters_list],
+            [p['right state'] for p in parameters_list],
+            params,
+            min(p.get('Newton precision', 1.e-10) for p in parameters_list)
+        )
+        return [
+            cls(dict(p, **{'star value': star})) if np.isfinite(star) else cls(p)
+            for p, star in zip(parameters_list, stars)
+        ]
+
     def _compute_waves(self):
         return [None]*4
 
@@ -154,22 +311,66 @@ class GenericSolver(object):
         """
         evaluate the exact solution at time t on the mesh x
         """
-        y = np.zeros((self.n, x.size))
-        if t == 0:
-            for k in range(self.n):
-                y[k, x < self.pos_disc] = self.u_left[k]
-                y[k, x >= self.pos_disc] = self.u_right[k]
-        else:
-            vxi = (x-self.pos_disc) / t
-            for k in range(self.n):
-                y[k, :] = self.values[0][k]  # left value
+        return self.evaluate_many(x, [t])[0]
 
-            for i in range(len(self.velocities)):
+    def evaluate_many(self, x, times):
+        """
+        evaluate the exact solution at several times on the mesh x
+
+        the result is an array of shape (len(times), n, x.size)
+
+        the regions between the waves are found with a single
+        searchsorted on the sorted wave velocities: the even regions
+        are the constant states and the odd ones are the inside
+        of the waves (the rarefaction fans)
+        """
+        x = np.asarray(x, dtype=np.float64)
+        times = np.asarray(times, dtype=np.float64).reshape(-1)
+        y = np.empty((times.size, x.size, self.n))
+
+        at_zero = times == 0
+        if np.any(at_zero):
+            y[at_zero] = np.where(
+                (x < self.pos_disc)[:, np.newaxis],
+                self.u_left, self.u_right
+            )
+
+        positive = np.logical_not(at_zero)
+        if np.any(positive):
+            vxi = (x[np.newaxis, :] - self.pos_disc) / times[positive, np.newaxis]
+            y[positive] = self._evaluate_xi(vxi)
+
+        return y.transpose(0, 2, 1)
+
+    def _evaluate_xi(self, vxi):
+        """
+        evaluate the self-similar solution for the values vxi = (x-x0)/t
+
+        the result has the shape vxi.shape + (n,)
+        """
+        edges = np.asarray(self.velocities, dtype=np.float64).reshape(-1)
+        states = np.array(
+            [np.asarray(self.values[2*i], dtype=np.float64)
+             for i in range(len(self.velocities) + 1)]
+        )
+
+        if np.any(np.diff(edges) < 0):
+            # the waves are not ordered: the last wave has the priority
+            region = np.zeros(vxi.shape, dtype=np.intp)
+            for i, (v_min, v_max) in enumerate(self.velocities):
                 if self.waves[i] == 'rarefaction':
-                    mask = np.logical_and(vxi > self.velocities[i][0], vxi < self.velocities[i][1])
-                    y[:, mask] = self.values[2*i+1](vxi[mask])
-                mask = vxi >= self.velocities[i][1]
-                y[:, mask] = np.asarray(self.values[2*i+2])[:, np.newaxis]
+                    region[np.logical_and(vxi > v_min, vxi < v_max)] = 2*i + 1
+                region[vxi >= v_max] = 2*i + 2
+        else:
+            region = np.searchsorted(edges, vxi, side='right')
+
+        # in a wave which is not a rarefaction, the state on the left is kept
+        y = states[region // 2]
+        for i, wave in enumerate(self.waves):
+            if wave == 'rarefaction':
+                mask = np.logical_and(region == 2*i + 1, vxi > self.velocities[i][0])
+                if np.any(mask):
+                    y[mask] = np.asarray(self.values[2*i + 1](vxi[mask])).T
         return y
 
     def diagram(self):
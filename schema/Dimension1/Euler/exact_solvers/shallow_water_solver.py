@@ -9,7 +9,7 @@ Shallow water
 
 import numpy as np
 import matplotlib.pyplot as plt
-from .riemann_solvers import GenericSolver, solve
+from .riemann_solvers import GenericSolver
 
 
 class ShallowWaterSolver(GenericSolver):
@@ -17,6 +17,8 @@ class ShallowWaterSolver(GenericSolver):
         d_t(h) + d_x(q) = 0
         d_t(q) + d_x(q^2/h+gh^2/2) = 0
     """
+    default_parameters = {'g': 9.81}
+
     def _read_particular_parameters(self, parameters):
         self.gravity = parameters.get('g', 9.81)
         self.fields = parameters.get('fields name', [r'$h$', r'$u$'])
@@ -25,11 +27,7 @@ class ShallowWaterSolver(GenericSolver):
         """
         Compute the intermediate state
         """
-        h_star = solve(
-            self._f1, self._f2,
-            self.u_left[0], self.u_right[0],
-            self.epsilon
-        )
+        h_star = self._solve_star()
         q_star = .5*(self._f1(h_star)[0]+self._f2(h_star)[0])
         self.u_star = np.array([h_star, q_star])
 
@@ -89,6 +87,35 @@ class ShallowWaterSolver(GenericSolver):
             self.waves.append('shock')
         self.values.append(self.u_right)
 
+    @classmethod
+    def _wave_many(cls, x, state, sign, parameters):
+        """
+        vectorized 1-wave (sign=-1) or 2-wave (sign=1)
+        parametrized by the height
+
+        the velocity q/h is returned instead of the momentum q
+        since q vanishes for h=0 on both waves
+        """
+        h, q = state[0], state[1]
+        gravity = parameters['g']
+        u, c = q/h, np.sqrt(gravity*h)
+        c_x = np.sqrt(gravity*x)
+
+        # rarefaction
+        u_rar = u - sign*2*(c - c_x)
+        du_rar = sign*c_x/x
+        # shock
+        z = x/h
+        root = np.sqrt(1+1/z)
+        u_sho = u + sign*c/np.sqrt(2)*(z-1)*root
+        du_sho = sign*c/np.sqrt(2)/h*(root - .5*(z-1)/(z**2*root))
+
+        rarefaction = x <= h
+        return (
+            np.where(rarefaction, u_rar, u_sho),
+            np.where(rarefaction, du_rar, du_sho)
+        )
+
     def _f1(self, h_star):
         """
         Compute the 1-wave that links the left state
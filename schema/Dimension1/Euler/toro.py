@@ -9,14 +9,26 @@ import matplotlib.pyplot as plt
 import matplotlib.gridspec as gridspec
 import numpy as np
 import sympy as sp
-import hashlib
 
 from .equation_type import Euler1D
 from .exact_solvers import EulerSolver as exact_solver
 from ..utils import riemann_pb
-from ...utils import HashBaseModel
+from ...utils import HashBaseModel, ExactSolutionCache
+
+cache_exact_solver = ExactSolutionCache(exact_solver, 'toro')
+
+def prepare_exact_solutions(cases, directory=None):
+    """
+    Compute the exact solvers of several Toro cases at once:
+    the intermediate states of the Riemann problems which are not
+    in the cache yet are computed by a single vectorized Newton method.
+    """
+    cache_exact_solver.warm(
+        [case.exact_solver_config() for case in cases],
+        exact_solver.build_many,
+        directory
+    )
 
-cache_exact_solver = {}
 class ToroCase(HashBaseModel):
     rho_left: float
     rho_right: float
@@ -106,22 +118,16 @@ class ToroCase(HashBaseModel):
     def set_size(self, size):
         self.xmax = self.xmin + size[0]
 
-    def get_exact_solution(self):
-        config = {
+    def exact_solver_config(self):
+        return {
             'jump abscissa': self.x_disc,
             'left state': [self.rho_left, self.u_left, self.p_left],
             'right state': [self.rho_right, self.u_right, self.p_right],
             'gamma': self.gamma,
         }
 
-        dhash = hashlib.md5()
-        dhash.update(f'{config.values()}'.encode())
-        hash = dhash.hexdigest()
-
-        if hash not in cache_exact_solver:
-            cache_exact_solver[hash] = exact_solver(config)
-
-        return cache_exact_solver[hash]
+    def get_exact_solution(self):
+        return cache_exact_solver.get(self.exact_solver_config())
 
     def state(self):
         exact_solution = self.get_exact_solution()
@@ -160,27 +166,33 @@ class ToroCase(HashBaseModel):
         ]
 
     def ref_solution(self, t, x, field=None):
+        output = self.ref_solution_many([t], x, field)
+        if field:
+            return output[0]
+        return {k: v[0] for k, v in output.items()}
+
+    def ref_solution_many(self, times, x, field=None):
+        """
+        Reference solution at several times: the first axis of the
+        output is the time.
+        """
         exact_solution = self.get_exact_solution()
-        sol_e = exact_solution.evaluate(x, t)
+        sol_e = exact_solution.evaluate_many(x, times)
+        rho, u, p = sol_e[:, 0], sol_e[:, 1], sol_e[:, 2]
 
-        to_subs = {self.equation.rho: sol_e[0],
-                   self.equation.q: sol_e[0]*sol_e[1],
-                   self.equation.E: .5*sol_e[0]*sol_e[1]**2 + sol_e[2]/(self.gamma-1.),
+        to_subs = {self.equation.rho: rho,
+                   self.equation.q: rho*u,
+                   self.equation.E: .5*rho*u**2 + p/(self.gamma-1.),
                    self.equation.gamma: self.gamma}
 
-        if field:
-            expr = self.equation.get_fields()[field]
+        def eval_field(expr):
             args = {str(s): to_subs[s] for s in expr.atoms(sp.Symbol)}
             func = sp.lambdify(list(expr.atoms(sp.Symbol)), expr, "numpy", dummify=False)
-            output = func(**args)
-        else:
-            output = {}
-            for k, v in self.equation.get_fields().items():
-                args = {str(s): to_subs[s] for s in v.atoms(sp.Symbol)}
-                func = sp.lambdify(list(v.atoms(sp.Symbol)), v, "numpy", dummify=False)
-                output[k] = func(**args)
-
-        return output
+            return np.broadcast_to(func(**args), rho.shape)
+
+        if field:
+            return eval_field(self.equation.get_fields()[field])
+        return {k: eval_field(v) for k, v in self.equation.get_fields().items()}
 
     def plot_ref_solution(self, fig):
         x_e = np.linspace(self.xmin, self.xmax, 1000)
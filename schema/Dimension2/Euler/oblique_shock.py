@@ -0,0 +1,160 @@
+# Authors:
+#     Loic Gouarin <loic.gouarin@polytechnique.edu>
+#     Benjamin Graille <benjamin.graille@universite-paris-saclay.fr>
+#     Thibaut Van Hoof <thibaut.vanhoof@cenaero.be>
+#
+# License: BSD 3 clause
+"""
+Vectorized solver of the theta-beta-Mach relation of the oblique shocks
+
+The angle beta of the attached shock on a wedge of half angle theta
+is the smallest root in ]theta, pi/2[ of f_beta. All the functions
+accept arrays of (theta, Mach, gamma) which are broadcast together.
+"""
+import numpy as np
+from scipy.interpolate import RegularGridInterpolator
+
+
+def f_beta(beta, theta, mach, gamma):
+    """
+    the function that gives the shock angle beta (divided by gamma times the inlet pressure)
+    """
+    st = np.sin(theta)
+    cb = np.cos(beta)
+    tb = np.tan(beta)
+    cdbmt = np.cos(beta-theta)**2
+    return mach**2*(
+        .5*(cdbmt - cb*cb) - gamma/(gamma-1)*cb*st*np.sin(beta-theta)
+    ) / cdbmt - 1/(gamma-1)*(
+        np.tan(beta-theta) - tb
+    ) / tb
+
+
+def shock_angle(theta, mach, gamma=1.4, epsilon=1.e-10, n_bracket=256):
+    """
+    compute the angle of the weak oblique shocks
+
+    the first sign change of f_beta is bracketed on a uniform grid
+    of ]theta, pi/2[ and refined by a bisection on all the values at once
+
+    Parameters
+    ----------
+    theta: float or ndarray
+        the half angle of the wedge (radian)
+    mach: float or ndarray
+        the Mach number of the inlet
+    gamma: float or ndarray
+        the ratio of the specific heats (default 1.4)
+    epsilon: float
+        the precision of the bisection (default 1.e-10)
+    n_bracket: int
+        the number of points of the bracketing grid (default 256)
+
+    Returns
+    -------
+    ndarray
+        the shock angles (radian), nan if the shock is detached
+    """
+    theta, mach, gamma = np.broadcast_arrays(
+        np.asarray(theta, dtype=float),
+        np.asarray(mach, dtype=float),
+        np.asarray(gamma, dtype=float)
+    )
+    shape = theta.shape
+    theta, mach, gamma = theta.ravel(), mach.ravel(), gamma.ravel()
+
+    # bracketing: grid of shape (n_bracket, n) without the end points
+    s = np.linspace(0, 1, n_bracket + 2)[1:-1, None]
+    grid = theta + s*(.5*np.pi - theta)
+    f_grid = f_beta(grid, theta, mach, gamma)
+    change = np.sign(f_grid[1:]) * np.sign(f_grid[:-1]) <= 0
+    found = change.any(axis=0) & (mach > 1) & (theta > 0)
+    first = np.argmax(change, axis=0)
+    columns = np.arange(theta.size)
+    a = grid[first, columns]
+    b = grid[first + 1, columns]
+    fa = f_grid[first, columns]
+
+    # bisection
+    n_iter = int(np.ceil(np.log2(max(np.max(b - a, initial=0), epsilon)/epsilon)))
+    for _ in range(n_iter):
+        c = .5*(a + b)
+        fc = f_beta(c, theta, mach, gamma)
+        left = fa*fc <= 0
+        b = np.where(left, c, b)
+        a = np.where(left, a, c)
+        fa = np.where(left, fa, fc)
+
+    beta = np.where(found, .5*(a + b), np.nan)
+    return beta.reshape(shape)
+
+
+def outlet_state(theta, beta, rho_in, ux_in, p_in):
+    """
+    compute the state behind the oblique shock of angle beta
+
+    Returns
+    -------
+    tuple
+        the density, the velocity (ux, uy) and the pressure
+    """
+    rho = rho_in * np.tan(beta) / np.tan(beta-theta)
+    v = ux_in * np.cos(beta) / np.cos(beta-theta)
+    p = p_in + rho_in*ux_in**2 * np.sin(beta)*np.sin(theta) \
+        / np.cos(beta-theta)
+    return rho, v*np.cos(theta), v*np.sin(theta), p
+
+
+def outlet_mach(theta, beta, mach, gamma=1.4):
+    """
+    compute the Mach number behind the oblique shock of angle beta
+    """
+    mach_out2 = np.sin(2*beta) / np.sin(2*beta-2*theta) / (
+        1/mach**2 + gamma*np.sin(beta)*np.sin(theta)/np.cos(beta-theta)
+    )
+    return np.sqrt(mach_out2)
+
+
+class ShockAngleTable:
+    """
+    precomputed table of the theta-beta-Mach relation for a given gamma
+
+    the shock angles are computed once on a (theta, Mach) grid by
+    shock_angle and then linearly interpolated: the values are nan
+    outside of the table and close to the detachment
+
+    Parameters
+    ----------
+    gamma: float
+        the ratio of the specific heats (default 1.4)
+    theta: tuple
+        the range of the half angle of the wedge in degree (default (0, 45))
+    mach: tuple
+        the range of the Mach number (default (1, 10))
+    n_theta: int
+        the number of angles in the table (default 181)
+    n_mach: int
+        the number of Mach numbers in the table (default 361)
+    """
+    def __init__(self, gamma=1.4, theta=(0, 45), mach=(1, 10), n_theta=181, n_mach=361):
+        self.gamma = gamma
+        self.theta = np.linspace(*theta, n_theta) * np.pi / 180
+        self.mach = np.linspace(*mach, n_mach)
+        self.beta = shock_angle(
+            self.theta[:, None], self.mach[None, :], gamma
+        )
+        self._interpolator = RegularGridInterpolator(
+            (self.theta, self.mach), self.beta,
+            bounds_error=False, fill_value=np.nan
+        )
+
+    def __call__(self, theta, mach):
+        """
+        interpolate the shock angles (radian) of the wedges of half
+        angles theta (radian) for the Mach numbers mach
+        """
+        theta, mach = np.broadcast_arrays(
+            np.asarray(theta, dtype=float), np.asarray(mach, dtype=float)
+        )
+        points = np.stack([theta.ravel(), mach.ravel()], axis=-1)
+        return self._interpolator(points).reshape(theta.shape)
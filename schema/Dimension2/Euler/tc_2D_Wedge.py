@@ -9,43 +9,44 @@ import matplotlib.pyplot as plt
 from matplotlib.patches import Polygon
 import numpy as np
 import sympy as sp
-import hashlib
+from collections import OrderedDict
 
 from .equation_type import Euler2D
-from ...utils import HashBaseModel
-
-
-def borne_sup(f, a, b_max):
-    fa = f(a)
-    b = b_max
-    fb = f(b)
-    h = 1
-    while fa*fb > 0 and h > 1.e-14:
-        h = .5*(b_max-a)
-        b_new = b-h
-        while fa*fb < fa*f(b_new):
-            h /= 2
-            b_new = b-h
-        b, fb = b_new, f(b_new)
-    return b
-
-
-def dichotomie(f, a, b_max, epsilon=1.e-10):
-    """Dichotomie to solve f(x)=0 in [a, b]"""
-    b = borne_sup(f, a, b_max)
-    fa, fb = f(a), f(b)
-    c = .5*(a+b)
-    fc = f(c)
-    if fa*fb > 0:
-        return np.nan
-    while b - a > epsilon:
-        if fa*fc >= 0:
-            a, fa = c, fc
-        if fb*fc >= 0:
-            b, fb = c, fc
-        c = .5*(a+b)
-        fc = f(c)
-    return c
+from .oblique_shock import shock_angle, outlet_state
+from ...utils import HashBaseModel, ExactSolutionCache
+
+
+# the arrays spread on the grids by the exact solvers: they are shared
+# by the solvers of the same wedge and the least recently used are
+# dropped when their total size exceeds grid_arrays_maxbytes
+grid_arrays_maxbytes = 256*2**20
+_grid_arrays = OrderedDict()
+_grid_arrays_nbytes = 0
+
+
+def grid_array(key, build):
+    """
+    Return the read-only array stored with key, built by build()
+    if it is not in the cache.
+    """
+    global _grid_arrays_nbytes
+    if key in _grid_arrays:
+        _grid_arrays.move_to_end(key)
+        return _grid_arrays[key]
+
+    data = build()
+    data.flags.writeable = False
+    _grid_arrays[key] = data
+    _grid_arrays_nbytes += data.nbytes
+    while _grid_arrays_nbytes > grid_arrays_maxbytes and len(_grid_arrays) > 1:
+        _, old = _grid_arrays.popitem(last=False)
+        _grid_arrays_nbytes -= old.nbytes
+    return data
+
+
+def inlet_mach(config):
+    rho_in, ux_in, p_in = config['inlet']
+    return ux_in / np.sqrt(config['gamma'] * p_in / rho_in)
 
 
 class exact_solver:
@@ -58,53 +59,102 @@ class exact_solver:
         rho_in, ux_in, p_in = config['inlet']
         gamma = config['gamma']
 
-        # the function that gives the shock angle
-        def f_alpha(alpha):
-            st = np.sin(theta)
-            ca = np.cos(alpha)
-            ta = np.tan(alpha)
-            cda = ca*ca
-            samt = np.sin(alpha-theta)
-            cdamt = np.cos(alpha-theta)**2
-            tamt = np.tan(alpha-theta)
-            return rho_in*ux_in**2*(
-                .5*(cdamt - cda) - gamma/(gamma-1)*ca*st*samt
-            ) / cdamt - gamma/(gamma-1)*p_in*(
-                tamt - ta
-            ) / ta
-
-        alpha = dichotomie(f_alpha, theta, 1.2)
-        if np.isnan(alpha):
-            return alpha, None, None, None, None
-        rho = rho_in * np.tan(alpha) / np.tan(alpha-theta)
-        v = ux_in * np.cos(alpha) / np.cos(alpha-theta)
-        p = p_in + rho_in*ux_in**2 * np.sin(alpha)*np.sin(theta) \
-            / np.cos(alpha-theta)
-        ux = v * np.cos(theta)
-        uy = v * np.sin(theta)
+        alpha = config.get('shock angle', None)
+        if alpha is None:
+            alpha = shock_angle(theta, inlet_mach(config), gamma)
+        alpha = float(alpha)
+        rho, ux, uy, p = outlet_state(theta, alpha, rho_in, ux_in, p_in)
 
         self.theta, self.alpha = theta, alpha
         self.rho_in, self.ux_in, self.uy_in, self.p_in = rho_in, ux_in, 0, p_in
         self.rho_out, self.ux_out, self.uy_out, self.p_out = rho, ux, uy, p
         self.posx = config['position_wedge']
-        self.sol = np.array([])
+
+    @classmethod
+    def build_many(cls, configs):
+        """
+        build the solvers of several wedges
+        the shock angles are computed at once by shock_angle
+        """
+        configs = list(configs)
+        if not configs:
+            return []
+        alphas = shock_angle(
+            [c['angle_degre'] * np.pi / 180 for c in configs],
+            [inlet_mach(c) for c in configs],
+            [c['gamma'] for c in configs]
+        )
+        return [
+            cls(dict(c, **{'shock angle': alpha}))
+            for c, alpha in zip(configs, alphas)
+        ]
+
+    def grid_key(self, x, y):
+        x, y = np.asarray(x), np.asarray(y)
+        return (self.posx, self.alpha, x.shape, y.shape, x.tobytes(), y.tobytes())
+
+    def mask(self, x, y):
+        """
+        Return the mask of the points behind the shock.
+
+        The mask is computed once by grid (see grid_array).
+        """
+        x, y = np.asarray(x), np.asarray(y)
+        return grid_array(
+            ('mask',) + self.grid_key(x, y),
+            lambda: y[None, :] <= (x[:, None]-self.posx) * np.tan(self.alpha)
+        )
+
+    def field(self, x, y, name, value_in, value_out):
+        """
+        Return the piecewise constant field name which is value_in
+        in front of the shock and value_out behind it.
+
+        The array is computed once by grid and shared between the calls:
+        it is read-only.
+        """
+        mask = self.mask(x, y)
+        return grid_array(
+            ('field', name, value_in, value_out) + self.grid_key(x, y),
+            lambda: np.where(mask, value_out, value_in)
+        )
 
     def evaluate(self, x, y, t):
-        if self.sol.shape != (4, x.size, y.size):
-            self.sol = np.zeros((4, x.size, y.size))
-            rho = self.sol[0]
-            ux = self.sol[1]
-            uy = self.sol[2]
-            p = self.sol[3]
-            ind_out = y[None, :] <= (x[:, None]-self.posx) * np.tan(self.alpha)
-            rho[:] = self.rho_in + (self.rho_out-self.rho_in) * ind_out
-            ux[:] = self.ux_in + (self.ux_out-self.ux_in) * ind_out
-            uy[:] = self.uy_in + (self.uy_out-self.uy_in) * ind_out
-            p[:] = self.p_in + (self.p_out-self.p_in) * ind_out
-        return self.sol
-
-
-cache_exact_solver = {}
+        """
+        Return the fields rho, ux, uy and p: the array is computed once
+        by grid and shared between the calls, it is read-only.
+        """
+        states = (
+            (self.rho_in, self.rho_out),
+            (self.ux_in, self.ux_out),
+            (self.uy_in, self.uy_out),
+            (self.p_in, self.p_out),
+        )
+
+        def build():
+            mask = self.mask(x, y)
+            data = np.empty((len(states),) + mask.shape)
+            for k, (value_in, value_out) in enumerate(states):
+                data[k] = value_in
+                data[k][mask] = value_out
+            return data
+
+        return grid_array(('state', states) + self.grid_key(x, y), build)
+
+
+cache_exact_solver = ExactSolutionCache(exact_solver, 'wedge')
+
+def prepare_exact_solutions(cases, directory=None):
+    """
+    Compute the exact solvers of several wedges at once:
+    the shock angles which are not in the cache yet are computed
+    by a single vectorized solver.
+    """
+    cache_exact_solver.warm(
+        [case.exact_solver_config() for case in cases],
+        exact_solver.build_many,
+        directory
+    )
 class tc_2D_wedge(HashBaseModel):
     xmin: float
     xmax: float
@@ -216,51 +266,44 @@ class tc_2D_wedge(HashBaseModel):
             },
         ]
 
-    def get_exact_solution(self):
-        config = {
+    def exact_solver_config(self):
+        return {
             'angle_degre': self.angle_degre,
             'inlet': [self.rho_in, self.ux_in, self.p_in],
             'gamma': self.gamma,
             'position_wedge': self.xmin + (self.xmax-self.xmin)*self.distance_relative
         }
 
-        dhash = hashlib.md5()
-        dhash.update(f'{config.values()}'.encode())
-        hash = dhash.hexdigest()
-
-        if hash not in cache_exact_solver:
-            cache_exact_solver[hash] = exact_solver(config)
-
-        return cache_exact_solver[hash]
+    def get_exact_solution(self):
+        return cache_exact_solver.get(self.exact_solver_config())
 
     def ref_solution(self, t, x, y, field=None):
         exact_solution = self.get_exact_solution()
-        sol_e = exact_solution.evaluate(x, y, t)
-        rho = sol_e[0]
-        ux, uy = sol_e[1], sol_e[2]
-        p = sol_e[3]
-
-        to_subs = {
-            self.equation.rho: rho,
-            self.equation.qx: rho*ux,
-            self.equation.qy: rho*uy,
-            self.equation.E: .5*rho*(ux**2+uy**2)+p/(self.gamma-1.),
-            self.equation.gamma: self.gamma
+        states = {
+            'in': (exact_solution.rho_in, exact_solution.ux_in, exact_solution.uy_in, exact_solution.p_in),
+            'out': (exact_solution.rho_out, exact_solution.ux_out, exact_solution.uy_out, exact_solution.p_out),
         }
 
+        # the solution is constant in front of and behind the shock:
+        # the fields are computed on the two states and then spread on the grid
+        def eval_field(name, expr):
+            values = []
+            for rho, ux, uy, p in states.values():
+                to_subs = {
+                    self.equation.rho: rho,
+                    self.equation.qx: rho*ux,
+                    self.equation.qy: rho*uy,
+                    self.equation.E: .5*rho*(ux**2+uy**2)+p/(self.gamma-1.),
+                    self.equation.gamma: self.gamma
+                }
+                args = {str(s): to_subs[s] for s in expr.atoms(sp.Symbol)}
+                func = sp.lambdify(list(expr.atoms(sp.Symbol)), expr, "numpy", dummify=False)
+                values.append(float(func(**args)))
+            return exact_solution.field(x, y, name, *values)
+
         if field:
-            expr = self.equation.get_fields()[field]
-            args = {str(s): to_subs[s] for s in expr.atoms(sp.Symbol)}
-            func = sp.lambdify(list(expr.atoms(sp.Symbol)), expr, "numpy", dummify=False)
-            output = func(**args)
-        else:
-            output = {}
-            for k, v in self.equation.get_fields().items():
-                args = {str(s): to_subs[s] for s in v.atoms(sp.Symbol)}
-                func = sp.lambdify(list(v.atoms(sp.Symbol)), v, "numpy", dummify=False)
-                output[k] = func(**args)
-
-        return output
+            return eval_field(field, self.equation.get_fields()[field])
+        return {k: eval_field(k, v) for k, v in self.equation.get_fields().items()}
 
     def plot_ref_solution(self, fig):
         exact_solution = self.get_exact_solution()
@@ -21,11 +21,71 @@ from copy import deepcopy
 from pkgutil import iter_modules
 from importlib import import_module
 
+import json
+import hashlib
+import pickle
+import tempfile
+from collections import OrderedDict
+from collections.abc import Mapping
+
+
+class LazyCases(Mapping):
+    """
+    dictionary of the cases of the local submodules which imports
+    a submodule only when its cases are requested
+
+    the names of the submodules are found on the disk without
+    importing them: listing the categories and the models is cheap
+    and the test cases and the schemes of a model are built the first
+    time the model is selected
+
+    Parameters
+    ----------
+    package_dir: string
+        the directory of the package
+    modulename: string
+        the name of the package
+    """
+    def __init__(self, package_dir, modulename):
+        self.package_dir = package_dir
+        self.modulename = modulename
+        self._names = [
+            module_name
+            for _, module_name, ispkg in iter_modules([package_dir])
+            if ispkg
+        ]
+        self._cases = {}
+
+    def __getitem__(self, key):
+        if key not in self._names:
+            raise KeyError(key)
+        if key not in self._cases:
+            module = import_module(f"{self.modulename}.{key}")
+            self._cases[key] = module.cases
+        return self._cases[key]
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def is_loaded(self, key):
+        """
+        return True if the submodule key is already imported
+        """
+        return key in self._cases
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self._names})"
+
 
 def define_cases(filename, modulename):
     """
     return the cases and known_cases of the local submodules
 
+    the submodules are imported lazily (see LazyCases)
+
     Parameters
     ----------
     filename: string
@@ -34,18 +94,185 @@ def define_cases(filename, modulename):
     Returns
     -------
 
-    cases: dictionary
+    cases: LazyCases
         the cases of the submodules
     """
-    cases = {}
-    gbl = globals()
-    package_dir = os.path.dirname(filename)
-    for _, module_name, ispkg in iter_modules([package_dir]):
-        if ispkg:
-            module = f"{modulename}.{module_name}"
-            gbl['md'] = import_module(module, package=None)
-            cases[module_name] = md.cases
-    return cases
+    return LazyCases(os.path.dirname(filename), modulename)
+
+
+def canonical_hash(config):
+    """
+    return a hash of a configuration which doesn't depend on the
+    order of the keys or on the type of the numbers (1 and 1.0 give
+    the same hash)
+
+    Parameters
+    ----------
+    config: dictionary
+
+    Returns
+    -------
+
+    hash: string
+    """
+    def canonical(obj):
+        if isinstance(obj, dict):
+            return {str(k): canonical(v) for k, v in obj.items()}
+        if isinstance(obj, (list, tuple, np.ndarray)):
+            return [canonical(v) for v in obj]
+        if isinstance(obj, numbers.Number) and not isinstance(obj, bool):
+            return repr(float(obj))
+        return str(obj)
+
+    encoded = json.dumps(canonical(config), sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class ExactSolutionCache:
+    """
+    cache of the exact solvers of the test cases
+
+    the solvers are kept in memory with a least recently used eviction
+    and, if a directory is given, pickled on disk so that they can be
+    shared between the processes of a parametric study
+
+    the directory can also be given by the environment variable
+    PYLBM_UI_EXACT_CACHE which is inherited by the worker processes
+
+    Parameters
+    ----------
+    builder: callable
+        build the exact solver from its configuration
+    name: string
+        the prefix of the files stored on disk
+    maxsize: int
+        the maximum number of solvers kept in memory (default is 32)
+    directory: string
+        the directory where the solvers are pickled (default is None)
+    """
+    env_directory = 'PYLBM_UI_EXACT_CACHE'
+
+    def __init__(self, builder, name, maxsize=32, directory=None):
+        self.builder = builder
+        self.name = name
+        self.maxsize = maxsize
+        self._directory = directory
+        self._solvers = OrderedDict()
+
+    @property
+    def directory(self):
+        if self._directory is not None:
+            return self._directory
+        return os.environ.get(self.env_directory)
+
+    def __len__(self):
+        return len(self._solvers)
+
+    def __contains__(self, config):
+        return canonical_hash(config) in self._solvers
+
+    def get(self, config):
+        """
+        return the exact solver of the configuration config
+        """
+        key = canonical_hash(config)
+        if key in self._solvers:
+            self._solvers.move_to_end(key)
+            return self._solvers[key]
+
+        solver = self._load(key)
+        if solver is None:
+            solver = self.builder(config)
+            self._dump(key, solver)
+        self._add(key, solver)
+        return solver
+
+    def warm(self, configs, build_many=None, directory=None):
+        """
+        compute the exact solvers of several configurations in advance
+
+        the solvers are stored on disk if a directory is set: the worker
+        processes then start with a warm cache
+
+        Parameters
+        ----------
+        configs: list
+            the configurations
+        build_many: callable
+            build several solvers at once from a list of configurations
+            (default is None: the solvers are built one by one)
+        directory: string
+            the directory where the solvers are pickled (default is None:
+            the directory of the cache)
+        """
+        missing = OrderedDict()
+        for config in configs:
+            key = canonical_hash(config)
+            if key in missing:
+                continue
+            if key in self._solvers:
+                if directory is not None:
+                    self._dump(key, self._solvers[key], directory)
+                continue
+            solver = self._load(key, directory)
+            if solver is not None:
+                self._add(key, solver)
+            else:
+                missing[key] = config
+
+        if build_many is not None:
+            solvers = build_many(list(missing.values()))
+        else:
+            solvers = [self.builder(config) for config in missing.values()]
+
+        for key, solver in zip(missing.keys(), solvers):
+            self._dump(key, solver, directory)
+            self._add(key, solver)
+
+    def clear(self):
+        """
+        remove the solvers kept in memory
+        """
+        self._solvers.clear()
+
+    def _add(self, key, solver):
+        self._solvers[key] = solver
+        while len(self._solvers) > self.maxsize:
+            self._solvers.popitem(last=False)
+
+    def _filename(self, key, directory):
+        return os.path.join(directory, f'{self.name}_{key}.pkl')
+
+    def _load(self, key, directory=None):
+        directory = directory or self.directory
+        if directory is None:
+            return None
+        try:
+            with open(self._filename(key, directory), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError, AttributeError):
+            return None
+
+    def _dump(self, key, solver, directory=None):
+        directory = directory or self.directory
+        if directory is None:
+            return
+        tmpfile = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # write in a temporary file to never read an incomplete file
+            fd, tmpfile = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(solver, f)
+            os.replace(tmpfile, self._filename(key, directory))
+        except (OSError, pickle.PickleError, AttributeError, TypeError):
+            # the solver is only kept in memory
+            if tmpfile is not None and os.path.exists(tmpfile):
+                try:
+                    os.remove(tmpfile)
+                except OSError:
+                    pass
+
 
 def freeze(d):
     if isinstance(d, dict):
@@ -88,18 +315,80 @@ class HashBaseModel(BaseModel):
             return open(html_filename).read()
 
         return ''
+
+
+def scheme_key(scheme, dico, parameters=True):
+    """
+    return a key describing the symbolic structure of a scheme
+
+    Parameters
+    ----------
+    scheme: Scheme
+        the scheme
+    dico: dict
+        the dictionary of the scheme
+    parameters: bool
+        if False, the numerical values of the parameters are not
+        part of the key (default True)
+    """
+    if not parameters:
+        dico = {k: v for k, v in dico.items() if k != 'parameters'}
+    return (type(scheme).__module__, type(scheme).__name__, repr(dico))
+
+
+class SchemeCache:
+    """
+    least recently used cache of the pylbm objects built from the
+    dictionaries of the schemes
+
+    Parameters
+    ----------
+    maxsize: int
+        the maximal number of objects kept (default 16)
+    """
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self._objects = OrderedDict()
+
+    def get(self, key, build):
+        """
+        return the object of the key or build it if it's not in the cache
+        """
+        if key in self._objects:
+            self._objects.move_to_end(key)
+            return self._objects[key]
+        obj = build()
+        self._objects[key] = obj
+        while len(self._objects) > self.maxsize:
+            self._objects.popitem(last=False)
+        return obj
+
+    def clear(self):
+        self._objects.clear()
+
+
+scheme_cache = SchemeCache()
+
+
 class Scheme:
     def get_information(self):
-        scheme = pylbm.Scheme(self.get_dictionary())
-        return scheme
+        dico = self.get_dictionary()
+        return scheme_cache.get(
+            ('scheme',) + scheme_key(self, dico),
+            lambda: pylbm.Scheme(dico)
+        )
 
     def get_required_param(self):
         return []
 
     def get_eqpde(self):
-        scheme = pylbm.Scheme(self.get_dictionary())
-        eqpde = pylbm.EquivalentEquation(scheme)
-        return eqpde
+        # the equivalent equations are symbolic in the parameters:
+        # they don't change when only their values are modified
+        dico = self.get_dictionary()
+        return scheme_cache.get(
+            ('eqpde',) + scheme_key(self, dico, parameters=False),
+            lambda: pylbm.EquivalentEquation(pylbm.Scheme(dico))
+        )
 
     def get_stability(self, state, markers1=None, markers2=None):
         dico = deepcopy(self.get_dictionary())
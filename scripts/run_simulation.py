@@ -9,10 +9,15 @@ sys.path.append('..')
 #######################################
 
 from pylbm_ui.simulation import simulation
+from pylbm_ui.coarse_to_fine import run_coarse_to_fine
 
 parser = argparse.ArgumentParser()
 parser.add_argument('config', help='config file to run the simulation', type=str)
 parser.add_argument('-o', '--output', help='output directory', type=str, default='Outputs')
+parser.add_argument('--checkpoint', help='period in minutes of the checkpoints (no checkpoint by default)', type=float, default=None)
+parser.add_argument('--resume', help='resume from the checkpoint of the output directory', action='store_true')
+parser.add_argument('--coarse-to-fine', help='space steps of the coarse grids used to initialize the simulation', type=float, nargs='+', default=None)
+parser.add_argument('--steady-tol', help='tolerance of the steady state of the coarse grids (run until the duration by default)', type=float, default=None)
 
 args = parser.parse_args()
 
@@ -29,13 +34,42 @@ simu = simulation()
 simu.reset_fields(lb_scheme.equation.get_fields())
 
 simu.reset_path(path)
-simu.reset_sol(None, test_case, lb_scheme, data['dx'])
-simu.save_config()
+coarse_dx = [dx for dx in (args.coarse_to_fine or []) if dx > data['dx']]
+if coarse_dx and not args.resume:
+    import time
+    t1 = time.time()
+    levels = run_coarse_to_fine(
+        simu, None, test_case, lb_scheme, coarse_dx + [data['dx']],
+        steady_tol=args.steady_tol, run_last=False
+    )
+    c2f_stats = {'levels': levels, 'time': time.time() - t1}
+    for level in levels[:-1]:
+        print(f"coarse grid dx={level['dx']:g}: {level['nt']:.0f} iterations in {level['LBM']:.2f}s")
+else:
+    c2f_stats = None
+    simu.reset_sol(None, test_case, lb_scheme, data['dx'])
+try:
+    resumed = args.resume and simu.resume()
+except ValueError as e:
+    sys.exit(f'cannot resume the simulation: {e}')
+if resumed:
+    print(f'resume from t={simu.sol.t} (iteration {simu.sol.nt})')
+else:
+    simu.save_config()
+    if c2f_stats:
+        simu.save_stats({'coarse to fine': c2f_stats})
+nt0 = simu.sol.nt
+if args.checkpoint:
+    simu.checkpoint.period = 60*args.checkpoint
 
 import time
 t1 = time.time()
 while simu.sol.t <= simu.duration:
     simu.sol.one_time_step()
+    if args.checkpoint:
+        simu.checkpoint(simu.sol)
 t2 = time.time()
+if args.checkpoint:
+    simu.checkpoint.save(simu.sol)
 print('execution time:', t2 - t1)
-print('MLUPS:,', simu.sol.nt*np.prod(simu.sol.domain.shape_in)/(t2 - t1)/1e6)
+print('MLUPS:,', (simu.sol.nt - nt0)*np.prod(simu.sol.domain.shape_in)/(t2 - t1)/1e6)